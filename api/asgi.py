@@ -0,0 +1,297 @@
+"""ASGI entry point: uvicorn api.asgi:app
+
+Serves the app of api/index.py with the LLM-bound routes
+POST /api/notes/translate and POST /api/notes/complete implemented on the
+event loop with the async OpenAI client, so one process keeps hundreds of
+upstream calls in flight (bounded by LLM_ASYNC_CONCURRENCY, see src/llm.py)
+instead of one per worker thread. Every other request is passed unchanged
+to the Flask app on a thread pool of ASGI_WSGI_THREADS threads.
+
+The async routes answer exactly like their Flask versions: request parsing,
+ownership checks, `async` jobs and the before/after_request hooks (metrics,
+CORS, compression) run through the same code in short worker-thread hops.
+Run a single event loop per process, e.g.
+
+    pip install uvicorn    # optional: not in requirements.txt
+    uvicorn api.asgi:app --host 0.0.0.0 --port 5001 --workers 4
+
+Several workers share the note cache only through NOTE_CACHE_URL; never
+set NOTE_CACHE_ENABLED=true without it there (see src/note_cache.py).
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from tempfile import SpooledTemporaryFile
+
+from flask import Response, request
+
+from api.index import app as flask_app
+from src import llm, translation
+from src.models.user import db
+from src.routes.note import resolve_llm_input, wants_stream
+from src.serialization import json_response, sse_event
+
+# Threads running the plain Flask routes (the WSGI side of this process)
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '32'))
+# Request bodies larger than this are spooled to a temporary file
+MAX_MEMORY_BODY = 1024 * 1024
+
+# path -> kind of the routes served on the event loop
+ASYNC_ROUTES = {
+    '/api/notes/translate': 'translate',
+    '/api/notes/complete': 'complete',
+}
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+
+
+def _path(scope):
+    """Path of the request below the mount point (root_path)."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    return path
+
+
+def _environ(scope, body):
+    """PEP 3333 environ for an ASGI http scope."""
+    root_path = scope.get('root_path', '')
+    path = _path(scope)
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    body = SpooledTemporaryFile(max_size=MAX_MEMORY_BODY)
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            body.seek(0)
+            return body
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+def _run_wsgi(environ, send_sync):
+    """Run the Flask app on a worker thread, relaying its response through send_sync."""
+    response_start = {}
+
+    def start_response(status, headers, exc_info=None):
+        response_start.update(_start_message(int(status.split(' ', 1)[0]), headers))
+
+    result = flask_app(environ, start_response)
+    try:
+        started = False
+        for chunk in result:
+            if not chunk:
+                continue
+            if not started:
+                send_sync(response_start)
+                started = True
+            send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not started:
+            send_sync(response_start)
+        send_sync({'type': 'http.response.body'})
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def _wsgi(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+
+    def send_sync(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    with body:
+        await loop.run_in_executor(_wsgi_executor, _run_wsgi, _environ(scope, body), send_sync)
+
+
+async def _send_response(send, response):
+    """Send a buffered Flask response."""
+    await send(_start_message(response.status_code, response.headers.items()))
+    await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+def _prepare(kind):
+    """Sync front half of an async route, run on a worker thread in the request context.
+
+    Returns (content, note_id, stream, None) to go on with the LLM call, or
+    (None, None, False, response) when the request is already answered.
+    """
+    try:
+        response = flask_app.preprocess_request()
+        if response is None:
+            data = request.get_json(silent=True) or {}
+            content, note_id, response = resolve_llm_input(kind, data)
+            if response is None:
+                return content, note_id, wants_stream(data), None
+    except Exception as e:
+        # As in Flask's full_dispatch_request: aborts and registered handlers
+        response = flask_app.handle_user_exception(e)
+    return None, None, False, flask_app.finalize_request(response)
+
+
+async def _answer(kind, content, note_id):
+    try:
+        if kind == 'translate':
+            translated, cached = await translation.translate_async(
+                content, source_lang='English', target_lang='Chinese', note_id=note_id
+            )
+            return {'translation': translated, 'cached': cached}, 200
+        return {'completion': await llm.complete_text_async(content)}, 200
+    except Exception as e:
+        return {'error': f'{"translation" if kind == "translate" else "completion"} failed', 'detail': str(e)}, 500
+
+
+async def _events(kind, content, note_id):
+    """Server-Sent Events of an async route, as sent by _sse_response in src/routes/note.py."""
+    parts = []
+    try:
+        if kind == 'translate':
+            cached = False
+            chunks = translation.translate_stream_async(
+                content, source_lang='English', target_lang='Chinese', note_id=note_id
+            )
+            async with aclosing(chunks):
+                async for delta, cached in chunks:
+                    parts.append(delta)
+                    yield sse_event({'delta': delta})
+            done = {'translation': ''.join(parts).strip(), 'cached': cached}
+        else:
+            async with aclosing(llm.complete_text_stream_async(content)) as chunks:
+                async for delta in chunks:
+                    parts.append(delta)
+                    yield sse_event({'delta': delta})
+            done = {'completion': ''.join(parts).strip()}
+        yield sse_event(done, event='done')
+    except Exception as e:
+        yield sse_event({'error': 'generation failed', 'detail': str(e)}, event='error')
+
+
+async def _respond(kind, send):
+    content, note_id, stream, response = await asyncio.to_thread(_prepare, kind)
+    if response is not None:
+        await _send_response(send, response)
+        return
+
+    if not stream:
+        payload, status = await _answer(kind, content, note_id)
+        response = await asyncio.to_thread(flask_app.finalize_request, (json_response(payload), status))
+        await _send_response(send, response)
+        return
+
+    # Headers go through the after_request hooks too; the body is sent as it is produced
+    response = Response(iter(()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response = await asyncio.to_thread(flask_app.finalize_request, response)
+    await send(_start_message(response.status_code, response.headers.items()))
+    async with aclosing(_events(kind, content, note_id)) as events:
+        async for event in events:
+            await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body'})
+
+
+async def _until_disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _async_route(kind, scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    with body:
+        ctx = flask_app.request_context(_environ(scope, body))
+        # Pushed in this task, so the worker-thread hops (asyncio.to_thread
+        # copies context variables) and the LLM call hooks share the request
+        ctx.push()
+        try:
+            work = asyncio.ensure_future(_respond(kind, send))
+            # A client that goes away cancels its upstream call
+            watcher = asyncio.ensure_future(_until_disconnected(receive))
+            try:
+                await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                work.cancel()
+                watcher.cancel()
+                # Let the work unwind (closing upstream streams) while the context is still pushed
+                await asyncio.gather(work, watcher, return_exceptions=True)
+            if not work.cancelled():
+                work.result()
+        finally:
+            # The session is keyed to the app context: release its connection
+            # off the loop, before the context is popped
+            await asyncio.to_thread(db.session.remove)
+            ctx.pop()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await llm.aclose()
+            _wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError(f"unsupported ASGI scope type {scope['type']!r}")
+
+    kind = ASYNC_ROUTES.get(_path(scope))
+    if kind and scope['method'] == 'POST':
+        await _async_route(kind, scope, receive, send)
+    else:
+        await _wsgi(scope, receive, send)
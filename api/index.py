@@ -1,19 +1,31 @@
 import os
 import sys
-from dotenv import load_dotenv
 
 # Add the project root to the Python path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.note import note_bp
-from src.models.note import Note
+from src import startup
 
-# Load environment variables
-load_dotenv()
+# Load environment variables before src modules read their settings
+with startup.phase('load .env'):
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
+
+with startup.phase('import flask'):
+    from flask import Flask, send_from_directory
+    from flask_cors import CORS
+
+with startup.phase('import models and routes'):
+    from src.models.user import db
+    from src import db_config, metrics, migrations
+    from src.routes.user import user_bp
+    from src.routes.note import note_bp
+    from src.routes.job import job_bp
+    from src.models.note import Note
+    from src.models.job import Job
+    from src.models.translation import TranslationCacheEntry
+    from src.models.embedding import NoteEmbedding
+    from src.models.note_change import NoteChange
 
 def create_app():
     # Flask app setup
@@ -24,27 +36,22 @@ def create_app():
     # Register blueprints
     app.register_blueprint(user_bp, url_prefix='/api')
     app.register_blueprint(note_bp, url_prefix='/api')
+    app.register_blueprint(job_bp, url_prefix='/api')
+    metrics.init_app(app)
 
-    # Supabase/Postgres only: configure SQLAlchemy
+    # Supabase/Postgres only: configure SQLAlchemy (URL, SSL and pooling, see src/db_config.py)
     db_url = os.getenv('DATABASE_URL')
     if not db_url:
         raise RuntimeError("DATABASE_URL not set. Please provide your Supabase Postgres connection string in environment variables.")
+    db_config.configure(app, db_url)
     
-    # Normalize postgres:// to postgresql:// for SQLAlchemy
-    if db_url.startswith('postgres://'):
-        db_url = db_url.replace('postgres://', 'postgresql://', 1)
-    
-    # Ensure SSL for production
-    if 'sslmode=' not in db_url:
-        db_url += ('&' if '?' in db_url else '?') + 'sslmode=require'
-    
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
-    # Initialize database
-    db.init_app(app)
-    with app.app_context():
-        db.create_all()
+    # Initialize database; the schema is migrated by `python -m src.manage migrate`
+    # unless DB_AUTO_MIGRATE is on (see src/db_config.py)
+    with startup.phase('init database'):
+        db.init_app(app)
+    if db_config.AUTO_MIGRATE:
+        with startup.phase('migrate schema'), app.app_context():
+            migrations.upgrade(db.engine)
 
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
@@ -65,7 +72,9 @@ def create_app():
     return app
 
 # Create the Flask app instance
-app = create_app()
+with startup.phase('create app'):
+    app = create_app()
+startup.finish()
 
 # This is the entry point for Vercel
 def handler(request):
@@ -1,19 +1,31 @@
 import os
 import sys
-from dotenv import load_dotenv
 
 # Add the project root to the Python path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.note import note_bp
-from src.models.note import Note
+from src import startup
 
-# Load environment variables
-load_dotenv()
+# Load environment variables before src modules read their settings
+with startup.phase('load .env'):
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
+
+with startup.phase('import flask'):
+    from flask import Flask, send_from_directory
+    from flask_cors import CORS
+
+with startup.phase('import models and routes'):
+    from src.models.user import db
+    from src import db_config, metrics, migrations
+    from src.routes.user import user_bp
+    from src.routes.note import note_bp
+    from src.routes.job import job_bp
+    from src.models.note import Note
+    from src.models.job import Job
+    from src.models.translation import TranslationCacheEntry
+    from src.models.embedding import NoteEmbedding
+    from src.models.note_change import NoteChange
 
 def create_app():
     # Flask app setup
@@ -24,6 +36,8 @@ def create_app():
     # Register blueprints
     app.register_blueprint(user_bp, url_prefix='/api')
     app.register_blueprint(note_bp, url_prefix='/api')
+    app.register_blueprint(job_bp, url_prefix='/api')
+    metrics.init_app(app)
 
     # Database configuration - 支持本地开发和生产环境
     IS_LOCAL_DEV = os.getenv('LOCAL_DEV', 'false').lower() == 'true'
@@ -31,7 +45,7 @@ def create_app():
     if IS_LOCAL_DEV:
         # 本地开发使用SQLite
         db_path = os.path.join(os.path.dirname(__file__), '..', 'local_notes.db')
-        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        db_config.configure(app, f'sqlite:///{db_path}')
         print("Using local SQLite database for development")
     else:
         # 生产环境使用Supabase/PostgreSQL
@@ -40,26 +54,21 @@ def create_app():
             # 如果没有DATABASE_URL，尝试使用SQLite作为fallback
             print("WARNING: DATABASE_URL not set, falling back to SQLite")
             db_path = os.path.join(os.path.dirname(__file__), '..', 'fallback_notes.db')
-            app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+            db_config.configure(app, f'sqlite:///{db_path}')
         else:
-            # 标准化PostgreSQL URL
-            if db_url.startswith('postgres://'):
-                db_url = db_url.replace('postgres://', 'postgresql://', 1)
-            if 'sslmode=' not in db_url:
-                db_url += ('&' if '?' in db_url else '?') + 'sslmode=require'
-            
-            app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+            # 标准化PostgreSQL URL并配置连接池（见 src/db_config.py）
+            db_config.configure(app, db_url)
             print(f"Using PostgreSQL database")
     
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
     # Initialize database
-    db.init_app(app)
+    with startup.phase('init database'):
+        db.init_app(app)
     
     try:
-        with app.app_context():
-            db.create_all()
-            print("Database tables created successfully")
+        if db_config.AUTO_MIGRATE:
+            with startup.phase('migrate schema'), app.app_context():
+                migrations.upgrade(db.engine)
+                print("Database schema is up to date")
     except Exception as e:
         print(f"Database initialization error: {e}")
         # 在生产环境可能需要抛出异常，本地开发可以继续
@@ -85,7 +94,9 @@ def create_app():
     return app
 
 # Create the Flask app instance
-app = create_app()
+with startup.phase('create app'):
+    app = create_app()
+startup.finish()
 
 # This is the entry point for Vercel
 def handler(request):
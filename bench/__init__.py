@@ -0,0 +1,15 @@
+"""Load tests and benchmarks for the note API.
+
+    python -m bench seed --db sqlite:///bench.db --notes 100000
+    python -m bench run --db sqlite:///bench.db --clients 16 --duration 30
+    python -m bench compare bench/results/<before>.json bench/results/<after>.json
+
+`seed` writes a deterministic synthetic corpus (same --seed, same notes),
+`run` serves the app in-process (or targets --url) and drives a weighted
+mix of list/get/search/create/update/translate requests from concurrent
+clients, with the LLM replaced by a local fake server of configurable
+latency. Each run prints p50/p95/p99 latency and req/s per operation and
+saves them, with the commit and settings, under bench/results/ so runs on
+different commits can be compared. Only the standard library and the app's
+own dependencies are used.
+"""
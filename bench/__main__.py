@@ -0,0 +1,183 @@
+"""Benchmark commands: python -m bench <command>
+
+  seed      write a synthetic corpus into a database
+  run       load test the note API and save a report under bench/results/
+  compare   compare two saved reports
+  fake-llm  serve the fake LLM API on its own (for --url targets)
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sqlalchemy as sa  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from bench import corpus, load  # noqa: E402
+from bench.fake_llm import FakeLLMServer  # noqa: E402
+
+# Settings of the app that change its performance; recorded with each run
+_RECORDED_ENV_PREFIXES = ('DB_', 'NOTE_', 'LLM_', 'JSON_', 'METRICS_', 'TRANSLATION_', 'JOB_', 'SEARCH_', 'EMBEDDING_', 'CHANGES_')
+_SECRET_MARKERS = ('KEY', 'TOKEN', 'PASSWORD', 'SECRET', 'URL')
+
+
+def _database_url(raw):
+    # Flask-SQLAlchemy resolves relative SQLite paths against the instance
+    # folder; make them absolute so the app and this tool open the same file
+    url = make_url(raw)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        url = url.set(database=os.path.abspath(url.database))
+    return url.render_as_string(hide_password=False)
+
+
+def _recorded_env():
+    return {
+        key: value for key, value in sorted(os.environ.items())
+        if key.startswith(_RECORDED_ENV_PREFIXES) and not any(m in key for m in _SECRET_MARKERS)
+    }
+
+
+def seed(args):
+    from src import migrations
+
+    engine = sa.create_engine(_database_url(args.db))
+    migrations.upgrade(engine, log=lambda message: None)
+    print(f'Seeding {args.notes} notes for {args.users} users into {engine.url.render_as_string()}')
+    started = time.perf_counter()
+    corpus.seed(engine, args.notes, users=args.users, seed_value=args.seed, reset=args.reset)
+    print(f'Done in {time.perf_counter() - started:.1f} s')
+
+
+def _serve_app():
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        # Keep client connections open, so TCP setup is not part of every sample
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    from api.index import app
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return f'http://127.0.0.1:{server.port}'
+
+
+def run(args):
+    try:
+        mix = load.parse_mix(args.mix)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    db_url = _database_url(args.db)
+    engine = sa.create_engine(db_url)
+    with engine.connect() as connection:
+        note_count = connection.execute(sa.text('SELECT count(*) FROM note')).scalar()
+    notes = load.sample_notes(engine)
+    if not notes:
+        raise SystemExit('no notes to work on; run `python -m bench seed` first')
+    users = sorted({user_id for _, user_id in notes})
+
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        if not args.real_llm:
+            fake = FakeLLMServer(latency=args.llm_latency, jitter=args.llm_jitter).start()
+            os.environ['OPENAI_API_BASE'] = fake.base_url
+            os.environ['OPENAI_API_KEY'] = 'bench'
+        os.environ['DATABASE_URL'] = db_url
+        os.environ.setdefault('DB_AUTO_MIGRATE', 'false')
+        os.environ.setdefault('NOTES_PROXY_SECRET', 'bench')
+        base_url = _serve_app()
+
+    print(f'{args.clients} clients, {args.warmup:g} s warm-up + {args.duration:g} s against {base_url} '
+          f'({note_count} notes, {len(users)} users)')
+    result = load.drive(
+        base_url, mix, notes, users,
+        clients=args.clients, duration=args.duration, warmup=args.warmup, seed=args.seed,
+    )
+    result['settings'] = {
+        'clients': args.clients,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'mix': mix,
+        'seed': args.seed,
+        'database': engine.dialect.name,
+        'notes': note_count,
+        'users': len(users),
+        'target': 'external' if args.url else 'in-process',
+        'llm': 'real' if args.real_llm else f'fake {args.llm_latency:g}s+{args.llm_jitter:g}s',
+        'env': _recorded_env(),
+    }
+    result['environment'] = load.environment()
+    print(load.format_report(result))
+    if not args.no_save:
+        print(f'Saved {load.save(result)}')
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(load.compare(before, after))
+
+
+def fake_llm(args):
+    server = FakeLLMServer(port=args.port, latency=args.llm_latency, jitter=args.llm_jitter)
+    print(f'Fake LLM API on {server.base_url} (set OPENAI_API_BASE to it)')
+    server.serve_forever()
+
+
+def _add_llm_options(parser):
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds per fake LLM call (default 0.5)')
+    parser.add_argument('--llm-jitter', type=float, default=0.1, help='random extra seconds (default 0.1)')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmark the note API.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='write a synthetic corpus')
+    seed_parser.add_argument('--db', default='sqlite:///bench.db', help='database URL (default sqlite:///bench.db)')
+    seed_parser.add_argument('--notes', type=int, default=10000, help='number of notes (default 10000)')
+    seed_parser.add_argument('--users', type=int, default=10, help='owners to spread them over (default 10)')
+    seed_parser.add_argument('--seed', type=int, default=1, help='random seed (default 1)')
+    seed_parser.add_argument('--reset', action='store_true', help='delete existing notes first')
+    seed_parser.set_defaults(run=seed)
+
+    run_parser = commands.add_parser('run', help='load test and report')
+    run_parser.add_argument('--db', default='sqlite:///bench.db', help='seeded database URL (default sqlite:///bench.db)')
+    run_parser.add_argument('--url', help='benchmark a running server instead of serving the app in-process')
+    run_parser.add_argument('--clients', type=int, default=8, help='concurrent clients (default 8)')
+    run_parser.add_argument('--duration', type=float, default=30, help='measured seconds (default 30)')
+    run_parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds first (default 5)')
+    run_parser.add_argument('--mix', default=load.DEFAULT_MIX, help=f'operation weights (default {load.DEFAULT_MIX})')
+    run_parser.add_argument('--seed', type=int, default=1, help='random seed of the clients (default 1)')
+    run_parser.add_argument('--real-llm', action='store_true', help='use the configured LLM instead of the fake')
+    run_parser.add_argument('--no-save', action='store_true', help='do not write a report file')
+    _add_llm_options(run_parser)
+    run_parser.set_defaults(run=run)
+
+    compare_parser = commands.add_parser('compare', help='compare two saved reports')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.set_defaults(run=compare)
+
+    fake_parser = commands.add_parser('fake-llm', help='serve the fake LLM API')
+    fake_parser.add_argument('--port', type=int, default=8089, help='port (default 8089)')
+    _add_llm_options(fake_parser)
+    fake_parser.set_defaults(run=fake_llm)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Deterministic synthetic corpus: users and notes of varied sizes.
+
+Words are drawn from a generated vocabulary with a Zipf-like frequency, so
+search terms range from very common to rare as in real text, and content
+lengths follow a log-normal distribution (most notes short, a long tail of
+large ones).
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+VOCABULARY_SIZE = 20000
+MEDIAN_CONTENT_CHARS = 600
+MAX_CONTENT_CHARS = 100_000
+INSERT_BATCH_SIZE = 5000
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+
+_SYLLABLES = [c + v for c in 'bcdfghjklmnprstvwz' for v in 'aeiou'] + ['an', 'el', 'in', 'or', 'us']
+
+_users = sa.table('user', sa.column('id'), sa.column('username'), sa.column('email'))
+_notes = sa.table(
+    'note',
+    sa.column('id'), sa.column('title'), sa.column('content'), sa.column('user_id'),
+    sa.column('created_at'), sa.column('updated_at'), sa.column('version'),
+)
+
+
+class Corpus:
+    """Random text generator; the same seed always yields the same text."""
+
+    def __init__(self, seed=1):
+        self.random = random.Random(seed)
+        words = set()
+        while len(words) < VOCABULARY_SIZE:
+            words.add(''.join(self.random.choices(_SYLLABLES, k=self.random.randint(1, 4))))
+        self.vocabulary = sorted(words)
+        self.random.shuffle(self.vocabulary)
+        # Zipf: the k-th most frequent word is drawn with weight 1/k
+        self._cumulative = []
+        total = 0.0
+        for rank in range(1, VOCABULARY_SIZE + 1):
+            total += 1.0 / rank
+            self._cumulative.append(total)
+
+    def words(self, count):
+        return self.random.choices(self.vocabulary, cum_weights=self._cumulative, k=count)
+
+    def search_term(self):
+        """A query term: mostly from the common half of the vocabulary, sometimes rare."""
+        return self.random.choice(self.vocabulary[:VOCABULARY_SIZE // (2 if self.random.random() < 0.8 else 1)])
+
+    def title(self):
+        return ' '.join(self.words(self.random.randint(2, 8))).capitalize()
+
+    def content(self):
+        length = min(int(self.random.lognormvariate(0, 1.2) * MEDIAN_CONTENT_CHARS) + 1, MAX_CONTENT_CHARS)
+        paragraphs = []
+        size = 0
+        while size < length:
+            sentence_count = self.random.randint(1, 6)
+            sentences = [' '.join(self.words(self.random.randint(4, 18))).capitalize() + '.'
+                         for _ in range(sentence_count)]
+            paragraph = ' '.join(sentences)
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        return '\n\n'.join(paragraphs)[:length]
+
+
+def seed(engine, notes, users=10, seed_value=1, reset=False, log=print):
+    """Insert `users` users and `notes` notes spread over them. Returns the user ids."""
+    corpus = Corpus(seed_value)
+    if reset:
+        with engine.begin() as connection:
+            connection.execute(_notes.delete())
+            connection.execute(_users.delete().where(_users.c.email.like(f'%@{BENCH_EMAIL_DOMAIN}')))
+
+    with engine.begin() as connection:
+        existing = connection.execute(sa.select(sa.func.count()).select_from(_notes)).scalar()
+        if existing and not reset:
+            raise SystemExit(f'note table already has {existing} rows; pass --reset to replace them')
+        user_ids = []
+        for i in range(users):
+            username = f'bench{i}'
+            user_id = connection.execute(sa.select(_users.c.id).where(_users.c.username == username)).scalar()
+            if user_id is None:
+                user_id = connection.execute(
+                    _users.insert().values(username=username, email=f'{username}@{BENCH_EMAIL_DOMAIN}')
+                    .returning(_users.c.id)
+                ).scalar()
+            user_ids.append(user_id)
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    inserted = 0
+    while inserted < notes:
+        rows = []
+        for i in range(inserted, min(inserted + INSERT_BATCH_SIZE, notes)):
+            updated_at = now - timedelta(seconds=corpus.random.randint(0, 365 * 86400))
+            rows.append({
+                'title': corpus.title(),
+                'content': corpus.content(),
+                'user_id': user_ids[i % len(user_ids)],
+                'created_at': updated_at - timedelta(seconds=corpus.random.randint(0, 30 * 86400)),
+                'updated_at': updated_at,
+                'version': 1,
+            })
+        with engine.begin() as connection:
+            connection.execute(_notes.insert(), rows)
+        inserted += len(rows)
+        rate = inserted / (time.perf_counter() - started)
+        log(f'  {inserted}/{notes} notes ({rate:.0f}/s)')
+    return user_ids
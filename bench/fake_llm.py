@@ -0,0 +1,140 @@
+"""Local stand-in for the OpenAI-compatible chat completions API.
+
+Answers POST .../chat/completions after `latency` seconds (plus up to
+`jitter`), echoing the last user message back, so LLM routes can be load
+tested without network access, cost or rate limits. With `"stream": true`
+the echo is sent as Server-Sent Events, one chunk per word every
+`token_interval` seconds. POST .../embeddings returns a deterministic
+pseudo-random vector per input text.
+"""
+import base64
+import hashlib
+import json
+import random
+from array import array
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _fake_embedding(text, dimensions):
+    rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+    return [rng.gauss(0, 1) for _ in range(dimensions)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self):
+        server = self.server
+        time.sleep(server.latency + random.uniform(0, server.jitter))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.rstrip('/').endswith('/embeddings'):
+            self.server.calls += 1
+            self._delay()
+            self._embeddings(body)
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        messages = body.get('messages') or [{}]
+        prompt = messages[-1].get('content') or ''
+        reply = prompt[:4000]
+        model = body.get('model', 'fake')
+        self.server.calls += 1
+        self._delay()
+        if body.get('stream'):
+            self._stream(model, reply)
+        else:
+            self._complete(model, prompt, reply)
+
+    def _embeddings(self, body):
+        texts = body.get('input') or []
+        texts = [texts] if isinstance(texts, str) else texts
+        dimensions = body.get('dimensions') or 1536
+        data = []
+        for index, text in enumerate(texts):
+            vector = _fake_embedding(text, dimensions)
+            if body.get('encoding_format') == 'base64':
+                vector = base64.b64encode(array('f', vector).tobytes()).decode('ascii')
+            data.append({'object': 'embedding', 'index': index, 'embedding': vector})
+        tokens = sum(_estimate_tokens(text) for text in texts)
+        self._send_json({
+            'object': 'list',
+            'model': body.get('model', 'fake'),
+            'data': data,
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        })
+
+    def _send_json(self, obj):
+        payload = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _complete(self, model, prompt, reply):
+        self._send_json({
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': _estimate_tokens(prompt),
+                'completion_tokens': _estimate_tokens(reply),
+                'total_tokens': _estimate_tokens(prompt) + _estimate_tokens(reply),
+            },
+        })
+
+    def _stream(self, model, reply):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for word in reply.split(' '):
+            chunk = {
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}],
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+            time.sleep(self.server.token_interval)
+        self.wfile.write(b'data: [DONE]\n\n')
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Async app servers open hundreds of upstream connections at once
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.5, jitter=0.1, token_interval=0.01):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.token_interval = token_interval
+        self.calls = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        """Serve from a daemon thread; returns self."""
+        threading.Thread(target=self.serve_forever, name='fake-llm', daemon=True).start()
+        return self
@@ -0,0 +1,269 @@
+"""Concurrent load driver, latency statistics and reports."""
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+import sqlalchemy as sa
+
+from bench.corpus import Corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+SAMPLE_SIZE = 10000
+DEFAULT_MIX = 'list=35,get=35,search=15,create=5,update=10'
+
+
+def parse_mix(raw):
+    """'list=40,get=60' -> {'list': 40.0, 'get': 60.0}"""
+    mix = {}
+    for part in raw.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'unknown operation {name!r}; choose from {", ".join(OPERATIONS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def sample_notes(engine, size=SAMPLE_SIZE):
+    """[(note_id, user_id)] of up to `size` random live notes: the targets of get/update."""
+    note = sa.table('note', sa.column('id'), sa.column('user_id'), sa.column('deleted_at'))
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(
+            sa.select(note.c.id, note.c.user_id).where(note.c.deleted_at.is_(None))
+            .order_by(sa.func.random()).limit(size)
+        )]
+
+
+# Each operation returns (method, path, JSON body or None, user id)
+
+def _op_list(state):
+    return 'GET', '/api/notes?limit=50&fields=summary', None, state.user()
+
+
+def _op_get(state):
+    note_id, user_id = state.note()
+    return 'GET', f'/api/notes/{note_id}', None, user_id
+
+
+def _op_search(state):
+    terms = ' '.join(state.corpus.search_term() for _ in range(state.random.randint(1, 2)))
+    return 'GET', f'/api/notes/search?q={quote(terms)}', None, state.user()
+
+
+def _op_semantic(state):
+    terms = ' '.join(state.corpus.search_term() for _ in range(state.random.randint(2, 5)))
+    return 'GET', f'/api/notes/search/semantic?q={quote(terms)}', None, state.user()
+
+
+def _op_create(state):
+    return 'POST', '/api/notes', {'title': state.corpus.title(), 'content': state.corpus.content()}, state.user()
+
+
+def _op_update(state):
+    note_id, user_id = state.note()
+    return 'PUT', f'/api/notes/{note_id}', {'title': state.corpus.title()}, user_id
+
+
+def _op_translate(state):
+    content = ' '.join(state.corpus.words(state.random.randint(20, 200)))
+    return 'POST', '/api/notes/translate', {'content': content}, state.user()
+
+
+OPERATIONS = {
+    'list': _op_list,
+    'get': _op_get,
+    'search': _op_search,
+    'semantic': _op_semantic,
+    'create': _op_create,
+    'update': _op_update,
+    'translate': _op_translate,
+}
+
+
+class _ClientState:
+    """Per-client random streams, so a run is reproducible for a given seed."""
+
+    def __init__(self, seed, notes, users):
+        self.random = random.Random(seed)
+        self.corpus = Corpus(seed)
+        self._notes = notes
+        self._users = users
+
+    def note(self):
+        return self.random.choice(self._notes)
+
+    def user(self):
+        return self.random.choice(self._users)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, status):
+        with self._lock:
+            self.latencies.setdefault(operation, []).append(seconds)
+            key = f'{operation} {status}'
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            if not (200 <= status < 400):
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, seconds):
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'count': len(values),
+        'errors': errors,
+        'rps': round(len(values) / seconds, 1) if seconds else 0,
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'p50_ms': ms(_percentile(values, 0.50)),
+        'p95_ms': ms(_percentile(values, 0.95)),
+        'p99_ms': ms(_percentile(values, 0.99)),
+        'max_ms': ms(values[-1]) if values else None,
+    }
+
+
+def _client(index, base_url, mix, notes, users, seed, deadline, warmup_until, recorder):
+    state = _ClientState(seed * 1000 + index, notes, users)
+    names, weights = list(mix), list(mix.values())
+    # Plays the authenticating proxy (see src/tenancy.py)
+    proxy_secret = os.getenv('NOTES_PROXY_SECRET')
+    target = urlsplit(base_url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=120)
+    while time.monotonic() < deadline:
+        operation = state.random.choices(names, weights)[0]
+        method, path, body, user_id = OPERATIONS[operation](state)
+        headers = {'X-User-Id': str(user_id), 'Accept-Encoding': 'identity'}
+        if proxy_secret:
+            headers['X-Proxy-Secret'] = proxy_secret
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        payload = json.dumps(body).encode() if body is not None else None
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = 0
+        elapsed = time.perf_counter() - started
+        if time.monotonic() >= warmup_until:
+            recorder.record(operation, elapsed, status)
+    connection.close()
+
+
+def drive(base_url, mix, notes, users, clients=8, duration=30.0, warmup=5.0, seed=1):
+    """Run `clients` concurrent clients for `warmup` + `duration` seconds."""
+    recorder = Recorder()
+    started = time.monotonic()
+    warmup_until = started + warmup
+    deadline = warmup_until + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(i, base_url, mix, notes, users, seed, deadline, warmup_until, recorder),
+            daemon=True,
+        )
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    measured = time.monotonic() - warmup_until
+
+    all_latencies = [v for values in recorder.latencies.values() for v in values]
+    return {
+        'operations': {
+            name: summarize(values, recorder.errors.get(name, 0), measured)
+            for name, values in sorted(recorder.latencies.items())
+        },
+        'total': summarize(all_latencies, sum(recorder.errors.values()), measured),
+        'statuses': recorder.statuses,
+        'measured_seconds': round(measured, 2),
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+    except OSError:
+        return ''
+
+
+def environment():
+    """What the numbers depend on besides the code: recorded with every run."""
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def format_report(result):
+    lines = [
+        f"{'operation':<10} {'count':>7} {'errors':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    ]
+    rows = list(result['operations'].items()) + [('total', result['total'])]
+    for name, stats in rows:
+        fmt = lambda v: f'{v:8.1f}' if v is not None else f'{"-":>8}'
+        lines.append(
+            f"{name:<10} {stats['count']:>7} {stats['errors']:>6} {stats['rps']:>8.1f} "
+            f"{fmt(stats['p50_ms'])} {fmt(stats['p95_ms'])} {fmt(stats['p99_ms'])} {fmt(stats['max_ms'])}"
+        )
+    return '\n'.join(lines)
+
+
+def save(result, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{result['environment']['commit'] or 'nogit'}.json"
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare(before, after):
+    """Side-by-side table of two saved runs, with relative changes."""
+    lines = []
+    if before['settings'] != after['settings']:
+        changed = sorted(k for k in set(before['settings']) | set(after['settings'])
+                         if before['settings'].get(k) != after['settings'].get(k))
+        lines.append(f"warning: runs used different settings ({', '.join(changed)}); numbers may not be comparable")
+    lines.append(f"{before['environment']['commit']} -> {after['environment']['commit']}")
+    lines.append(f"{'operation':<10} {'metric':<7} {'before':>10} {'after':>10} {'change':>8}")
+    names = sorted(set(before['operations']) | set(after['operations'])) + ['total']
+    for name in names:
+        old = before['total'] if name == 'total' else before['operations'].get(name)
+        new = after['total'] if name == 'total' else after['operations'].get(name)
+        if not old or not new:
+            continue
+        for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            a, b = old[metric], new[metric]
+            change = f'{(b - a) / a * 100:+7.1f}%' if a and b is not None else f'{"-":>8}'
+            lines.append(f"{name:<10} {metric:<7} {a if a is not None else '-':>10} {b if b is not None else '-':>10} {change}")
+    return '\n'.join(lines)
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache with a per-entry time-to-live.
+
+    Holds at most `maxsize` entries; the least recently used entry is evicted
+    first. Entries older than `ttl` seconds are treated as misses. Hit, miss
+    and eviction counts are kept for reporting.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class RedisCache:
+    """TTLCache-compatible cache kept in Redis, shared by all processes.
+
+    Needs the optional `redis` package. Values are stored as bytes under
+    `prefix`; errors talking to Redis count as misses, so an unavailable
+    cache slows requests down instead of failing them.
+    """
+
+    def __init__(self, url, ttl=None, prefix='cache:', timeout=0.5):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._errors = redis.RedisError
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._client.get(self.prefix + key)
+        except self._errors:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self._client.set(self.prefix + key, value, ex=ttl or None)
+        except self._errors:
+            self.errors += 1
+
+    def delete(self, key):
+        try:
+            self._client.delete(self.prefix + key)
+        except self._errors:
+            self.errors += 1
+
+    def clear(self):
+        try:
+            keys = list(self._client.scan_iter(match=self.prefix + '*'))
+            if keys:
+                self._client.delete(*keys)
+        except self._errors:
+            self.errors += 1
+
+    def stats(self):
+        return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+def from_url(url=None, maxsize=1024, ttl=None, prefix='cache:'):
+    """Cache for `url`: redis:// (or rediss://) for RedisCache, else an in-process TTLCache."""
+    if url and url.split('://', 1)[0] in ('redis', 'rediss', 'unix'):
+        return RedisCache(url, ttl=ttl, prefix=prefix)
+    return TTLCache(maxsize=maxsize, ttl=ttl)
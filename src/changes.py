@@ -0,0 +1,191 @@
+"""Change capture for data derived from notes (embeddings, and what comes next).
+
+Note writes add a row per note to the note_change outbox in the same
+transaction (record()), so a committed write is never missed and a rolled
+back one never seen. The job workers (src/jobs.py) drain the outbox in
+batches: the batch's notes are read once, their title and content hashed
+and compared with Note.content_hash, and only the notes whose text really
+changed are passed to the subscribers, grouped by owner. Re-saves of the
+same text, version-only writes and several edits of one note before the
+batch runs cost one hash each, so the work follows the edits, not the
+corpus.
+
+Subscribers register with @subscriber('name', active=...) and must be
+idempotent: an owner's changes are retried (CHANGES_MAX_ATTEMPTS times,
+then left in the table with their error) when a subscriber fails, and
+workers of two processes may occasionally handle the same change. Nothing
+is recorded while no subscriber is active.
+
+    python -m src.manage changes   # drain the outbox by hand, --retry failed rows
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from src.models.note import Note, db
+from src.models.note_change import NoteChange
+
+# Outbox rows taken per batch
+BATCH_SIZE = int(os.getenv('CHANGES_BATCH_SIZE', '500'))
+MAX_ATTEMPTS = int(os.getenv('CHANGES_MAX_ATTEMPTS', '5'))
+RETRY_DELAY = float(os.getenv('CHANGES_RETRY_DELAY', '30'))
+
+SUBSCRIBERS = {}
+
+# One draining thread per process; the others have nothing to add
+_drain_lock = threading.Lock()
+_counters = {'changed': 0, 'unchanged': 0, 'failed': 0}
+
+_UPDATE_HASH = (
+    Note.__table__.update()
+    .where(Note.id == db.bindparam('h_id'))
+    # Not a user-visible write: keep updated_at (and the changes feed) as it is
+    .values(content_hash=db.bindparam('h_hash'), updated_at=Note.updated_at)
+)
+
+
+def subscriber(name, active=None):
+    """Register `fn(user_id, note_ids)`, called with notes of `user_id` whose text changed.
+
+    `active()` tells whether it wants changes at the moment (default:
+    always). Deleted notes are passed too; their title and content are empty.
+    """
+    def decorator(fn):
+        SUBSCRIBERS[name] = (fn, active or (lambda: True))
+        return fn
+    return decorator
+
+
+def enabled():
+    return any(active() for _, active in SUBSCRIBERS.values())
+
+
+def content_hash(title, content):
+    return hashlib.sha256(f'{title}\0{content}'.encode('utf-8')).hexdigest()
+
+
+def record(note_ids):
+    """Add outbox rows for written notes to the current transaction.
+
+    Returns whether anything was recorded; call jobs.notify() after the
+    commit so a worker picks the rows up.
+    """
+    if not note_ids or not enabled():
+        return False
+    now = datetime.utcnow()
+    db.session.execute(
+        db.insert(NoteChange),
+        [{'note_id': note_id, 'attempts': 0, 'run_after': now, 'created_at': now} for note_id in sorted(note_ids)],
+    )
+    return True
+
+
+def process_pending(max_batches=None):
+    """Drain runnable outbox rows in batches of BATCH_SIZE. Returns the number of rows handled.
+
+    Returns 0 at once when another thread of this process is draining.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        return 0
+    try:
+        handled = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = _process_batch()
+            if not count:
+                break
+            handled += count
+            batches += 1
+        return handled
+    finally:
+        _drain_lock.release()
+
+
+def _process_batch():
+    now = datetime.utcnow()
+    rows = db.session.query(NoteChange.id, NoteChange.note_id).filter(
+        NoteChange.attempts < MAX_ATTEMPTS, NoteChange.run_after <= now
+    ).order_by(NoteChange.id).limit(BATCH_SIZE).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    # Read after the outbox rows, so every write they record is visible
+    notes = db.session.query(
+        Note.id, Note.user_id, Note.title, Note.content, Note.deleted_at, Note.content_hash
+    ).filter(Note.id.in_({row.note_id for row in rows})).all()
+    owners = {note.id: note.user_id for note in notes}
+    changed = {}
+    for note in notes:
+        new_hash = '' if note.deleted_at else content_hash(note.title, note.content)
+        if new_hash != note.content_hash:
+            changed.setdefault(note.user_id, {})[note.id] = new_hash
+
+    pending, done = {}, []
+    for row in rows:
+        user_id = owners.get(row.note_id)
+        if row.note_id in changed.get(user_id, ()):
+            pending.setdefault(user_id, []).append(row.id)
+        else:
+            done.append(row.id)
+
+    # Changes of notes whose text is as processed, or that are gone, are done with
+    if done:
+        NoteChange.query.filter(NoteChange.id.in_(done)).delete(synchronize_session=False)
+    db.session.commit()
+    _counters['unchanged'] += len(done)
+
+    for user_id, hashes in changed.items():
+        _process_owner(user_id, hashes, pending[user_id])
+    return len(rows)
+
+
+def _process_owner(user_id, hashes, change_ids):
+    """Run the subscribers on one owner's changed notes, then mark them processed."""
+    try:
+        for fn, active in SUBSCRIBERS.values():
+            if active():
+                fn(user_id, sorted(hashes))
+        db.session.execute(_UPDATE_HASH, [{'h_id': note_id, 'h_hash': h} for note_id, h in hashes.items()])
+        NoteChange.query.filter(NoteChange.id.in_(change_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        _counters['changed'] += len(change_ids)
+    except Exception as e:
+        db.session.rollback()
+        _counters['failed'] += len(change_ids)
+        current_app.logger.warning('processing changes of user %s failed: %s', user_id, e)
+        db.session.execute(
+            db.update(NoteChange).where(NoteChange.id.in_(change_ids)).values(
+                attempts=NoteChange.attempts + 1,
+                run_after=datetime.utcnow() + timedelta(seconds=RETRY_DELAY),
+                error=str(e),
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+def retry_failed():
+    """Make rows that used up their attempts runnable again. Returns how many."""
+    count = NoteChange.query.filter(NoteChange.attempts >= MAX_ATTEMPTS).update(
+        {NoteChange.attempts: 0, NoteChange.run_after: datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+
+def backlog():
+    """{'pending': n, 'failed': n} rows in the outbox."""
+    failed = NoteChange.attempts >= MAX_ATTEMPTS
+    pending, failed = db.session.query(
+        db.func.count(NoteChange.id) - db.func.count(db.case((failed, 1))),
+        db.func.count(db.case((failed, 1))),
+    ).one()
+    return {'pending': pending, 'failed': failed}
+
+
+def stats():
+    """Outbox rows handled by this process, by outcome."""
+    return dict(_counters)
@@ -0,0 +1,104 @@
+"""Database connection settings shared by the app factories.
+
+`configure(app, url)` normalises a DATABASE_URL and sets the SQLAlchemy
+engine options for it:
+
+- Long-running servers (DB_POOL_MODE=queue, the default) keep a pool of
+  connections that are checked with a ping before use and recycled before
+  Supabase/PgBouncer closes them as idle.
+- Serverless deployments (DB_POOL_MODE=null, the default when VERCEL is
+  set) keep no connections between requests; point DATABASE_URL at the
+  Supabase transaction pooler (port 6543) so opening one is cheap.
+- Behind PgBouncer in transaction mode (port 6543, a *.pooler.supabase.com
+  host, `?pgbouncer=true` or DB_PGBOUNCER=true) drivers that prepare
+  statements server-side are told not to, since consecutive transactions
+  may run on different server connections. psycopg2 never does.
+"""
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+POOL_MODE = os.getenv('DB_POOL_MODE') or ('null' if os.getenv('VERCEL') else 'queue')
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Below the idle timeouts of Supabase's poolers, so the pool drops connections first
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '300'))
+POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+APPLICATION_NAME = os.getenv('DB_APPLICATION_NAME', 'notetaker')
+PGBOUNCER = os.getenv('DB_PGBOUNCER', '').lower()
+# Apply pending schema migrations when the app starts. Off on Vercel, where it
+# would add round trips to every cold start: run `python -m src.manage migrate`.
+AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'false' if os.getenv('VERCEL') else 'true').lower() == 'true'
+
+PGBOUNCER_PORT = 6543
+
+
+def normalize_url(db_url):
+    """postgres:// -> postgresql:// and SSL required, as Supabase expects."""
+    if db_url.startswith('postgres://'):
+        db_url = db_url.replace('postgres://', 'postgresql://', 1)
+    if db_url.startswith('postgresql') and 'sslmode=' not in db_url:
+        db_url += ('&' if '?' in db_url else '?') + 'sslmode=require'
+    return db_url
+
+
+def uses_pgbouncer(url):
+    """Whether `url` goes through a transaction-mode PgBouncer."""
+    if PGBOUNCER in ('true', 'false'):
+        return PGBOUNCER == 'true'
+    return (
+        url.query.get('pgbouncer') == 'true'
+        or url.port == PGBOUNCER_PORT
+        or (url.host or '').endswith('.pooler.supabase.com')
+    )
+
+
+def engine_options(url, pgbouncer=False):
+    """SQLALCHEMY_ENGINE_OPTIONS for a parsed URL."""
+    if url.get_backend_name() != 'postgresql':
+        return {}
+
+    driver = url.get_driver_name()
+    connect_args = {}
+    if driver in ('psycopg2', 'psycopg'):
+        connect_args.update(
+            connect_timeout=CONNECT_TIMEOUT,
+            application_name=APPLICATION_NAME,
+            # Detect connections silently dropped by NATs and load balancers
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=5,
+        )
+    if pgbouncer:
+        if driver == 'psycopg':
+            connect_args['prepare_threshold'] = None
+        elif driver == 'asyncpg':
+            connect_args.update(statement_cache_size=0, prepared_statement_cache_size=0)
+
+    if POOL_MODE == 'null':
+        return {'poolclass': NullPool, 'connect_args': connect_args}
+    return {
+        'pool_size': POOL_SIZE,
+        'max_overflow': MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'pool_recycle': POOL_RECYCLE,
+        'pool_pre_ping': POOL_PRE_PING,
+        # Reuse the most recent connection, so surplus ones idle out and get recycled
+        'pool_use_lifo': True,
+        'connect_args': connect_args,
+    }
+
+
+def configure(app, db_url):
+    """Set the database URI and engine options on `app` (before db.init_app)."""
+    url = make_url(normalize_url(db_url))
+    pgbouncer = uses_pgbouncer(url)
+    # libpq rejects the pgbouncer flag, it is only a hint for us
+    url = url.difference_update_query(['pgbouncer'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = url.render_as_string(hide_password=False)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, pgbouncer)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -0,0 +1,323 @@
+"""Note embeddings and semantic search.
+
+Notes are embedded (title and content) by the configured embedder and the
+float32 vectors stored in note_embedding, one row per note. Written notes
+reach refresh() through the change outbox (src/changes.py), which only
+embeds notes whose text changed; `python -m src.manage embed` backfills
+everything.
+
+Searches run against a per-user in-memory index (src/vector_index.py),
+loaded on first use and kept current by reading only the rows written since
+(one max(updated_at) index lookup per search). Embedders:
+
+  llm   the embeddings API of the configured LLM endpoint (OPENAI_EMBED_MODEL)
+  hash  a local feature-hashing embedder: lexical rather than semantic, for
+        offline development, tests and benchmarks
+
+More can be added with @embedder('name') and selected by EMBEDDING_BACKEND.
+NumPy is imported on first use, so apps that never search do not pay for it.
+"""
+import hashlib
+import os
+import re
+import threading
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+
+from src import changes, llm
+from src.cache import TTLCache
+from src.models.embedding import NoteEmbedding
+from src.models.note import Note, db
+
+# llm, hash, or off (no embeddings are computed and semantic search answers 503)
+BACKEND = os.getenv('EMBEDDING_BACKEND', 'off')
+DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '256'))
+# Text beyond this many characters of title + content is not embedded
+MAX_CHARS = int(os.getenv('EMBEDDING_MAX_CHARS', '8000'))
+# Notes embedded per API call
+BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+# Per-user indexes kept in memory, least recently searched evicted first
+INDEX_USERS = int(os.getenv('EMBEDDING_INDEX_USERS', '32'))
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL = 3600
+LOAD_BATCH_SIZE = 5000
+PREVIEW_LENGTH = 200
+# Rows written up to this long before the newest row seen are re-read by a
+# delta sync, so a transaction that committed late is not skipped
+SYNC_SETTLE_SECONDS = 2
+
+EMBEDDERS = {}
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_indexes = TTLCache(maxsize=INDEX_USERS)
+_indexes_lock = threading.Lock()
+_query_vectors = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+
+
+def embedder(name):
+    """Register `fn(texts) -> vectors` as the embedder selected by EMBEDDING_BACKEND=name.
+
+    It must return one vector of DIMENSIONS floats per text, in order.
+    """
+    def decorator(fn):
+        EMBEDDERS[name] = fn
+        return fn
+    return decorator
+
+
+@embedder('llm')
+def _embed_llm(texts):
+    return llm.embed_texts(texts, dimensions=DIMENSIONS)
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word):
+    # The word itself and the trigrams of <word>, so inflections overlap
+    padded = f'<{word}>'
+    features = [word] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+    hashes = [zlib.crc32(feature.encode('utf-8')) for feature in features]
+    return [(h % DIMENSIONS, 1.0 if h & 0x80000000 else -1.0) for h in hashes]
+
+
+@embedder('hash')
+def _embed_hash(texts):
+    import numpy as np
+
+    vectors = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        vector = vectors[row]
+        for word in _WORD_RE.findall(text.lower()):
+            for index, sign in _word_features(word):
+                vector[index] += sign
+    # Damp frequent words, as tf weighting would
+    return np.sign(vectors) * np.log1p(np.abs(vectors))
+
+
+def enabled():
+    return BACKEND in EMBEDDERS
+
+
+def model_name():
+    """What produced a stored vector; rows of any other model are re-embedded."""
+    name = llm.EMBED_MODEL if BACKEND == 'llm' else BACKEND
+    return f'{name}:{DIMENSIONS}'
+
+
+def note_text(title, content):
+    return f'{title}\n\n{content}'[:MAX_CHARS]
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def embed(texts):
+    """Unit-length float32 array of shape (len(texts), DIMENSIONS)."""
+    from src.vector_index import normalize
+
+    vectors = normalize(EMBEDDERS[BACKEND](list(texts)))
+    if vectors.shape != (len(texts), DIMENSIONS):
+        raise ValueError(f'{BACKEND} embedder returned shape {vectors.shape}, expected ({len(texts)}, {DIMENSIONS})')
+    return vectors
+
+
+def refresh(user_id, note_ids=None):
+    """Embed the notes of `user_id` whose text changed since they were embedded.
+
+    Deleted notes get an empty vector, which removes them from the search
+    indexes. Limited to `note_ids` when given. Returns the number of notes
+    sent to the embedder.
+    """
+    model = model_name()
+    stale = db.session.query(Note.id).outerjoin(NoteEmbedding, NoteEmbedding.note_id == Note.id).filter(
+        Note.user_id == user_id
+    )
+    if note_ids is not None:
+        # Not by timestamp: a note edited while its last embed() ran is older
+        # than that embedding; _refresh_batch compares the text hashes instead
+        stale = stale.filter(Note.id.in_(note_ids))
+    else:
+        stale = stale.filter(or_(
+            NoteEmbedding.note_id.is_(None) & Note.deleted_at.is_(None),
+            NoteEmbedding.model != model,
+            NoteEmbedding.updated_at < Note.updated_at,
+        ))
+    stale_ids = [row.id for row in stale.order_by(Note.id)]
+
+    embedded = 0
+    for start in range(0, len(stale_ids), BATCH_SIZE):
+        embedded += _refresh_batch(user_id, model, stale_ids[start:start + BATCH_SIZE])
+    return embedded
+
+
+def _refresh_batch(user_id, model, note_ids):
+    rows = db.session.query(
+        Note.id, Note.title, Note.content, Note.deleted_at, NoteEmbedding.model, NoteEmbedding.content_hash
+    ).outerjoin(NoteEmbedding, NoteEmbedding.note_id == Note.id).filter(Note.id.in_(note_ids)).all()
+
+    entries, unchanged, texts = [], [], []
+    for row in rows:
+        if row.deleted_at:
+            entries.append({'note_id': row.id, 'content_hash': '', 'vector': b''})
+            continue
+        text = note_text(row.title, row.content)
+        content_hash = text_hash(text)
+        if row.model == model and row.content_hash == content_hash:
+            unchanged.append(row.id)
+        else:
+            entries.append({'note_id': row.id, 'content_hash': content_hash, 'vector': None})
+            texts.append(text)
+
+    if texts:
+        vectors = iter(embed(texts))
+        for entry in entries:
+            if entry['vector'] is None:
+                entry['vector'] = next(vectors).astype('<f4').tobytes()
+
+    # After embed(): stamped before a slow call, the rows could already be
+    # older than an index sync that ran meanwhile and never be loaded
+    now = datetime.utcnow()
+    try:
+        if entries:
+            NoteEmbedding.query.filter(
+                NoteEmbedding.note_id.in_([entry['note_id'] for entry in entries])
+            ).delete(synchronize_session=False)
+            db.session.execute(
+                db.insert(NoteEmbedding),
+                [dict(entry, user_id=user_id, model=model, updated_at=now) for entry in entries],
+            )
+        if unchanged:
+            # Only the version or timestamp moved: mark the row current
+            NoteEmbedding.query.filter(NoteEmbedding.note_id.in_(unchanged)).update(
+                {NoteEmbedding.updated_at: now}, synchronize_session=False
+            )
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent refresh stored the same notes
+        db.session.rollback()
+    return len(texts)
+
+
+@changes.subscriber('embeddings', active=enabled)
+def _refresh_changed(user_id, note_ids):
+    refresh(user_id, note_ids)
+
+
+class _UserIndex:
+    """A user's vectors in memory plus the newest row they reflect."""
+
+    def __init__(self):
+        from src.vector_index import VectorIndex
+
+        self.index = VectorIndex(DIMENSIONS)
+        self.latest = None
+        self.lock = threading.Lock()
+
+    def apply(self, rows):
+        ids, vectors, removed = [], [], []
+        for note_id, vector in rows:
+            if len(vector) == DIMENSIONS * 4:
+                ids.append(note_id)
+                vectors.append(vector)
+            else:
+                removed.append(note_id)
+        if ids:
+            import numpy as np
+
+            self.index.upsert(ids, np.frombuffer(b''.join(vectors), dtype='<f4').reshape(-1, DIMENSIONS))
+        if removed:
+            self.index.remove(removed)
+
+
+def _load_rows(user_id, model, since=None):
+    statement = db.select(NoteEmbedding.note_id, NoteEmbedding.vector).where(
+        NoteEmbedding.user_id == user_id, NoteEmbedding.model == model
+    )
+    if since is not None:
+        statement = statement.where(NoteEmbedding.updated_at >= since)
+    result = db.session.execute(statement.execution_options(yield_per=LOAD_BATCH_SIZE))
+    for rows in result.partitions():
+        yield rows
+
+
+def _user_index(user_id, model):
+    """The in-memory index of `user_id`, brought up to date with note_embedding.
+
+    Rows are replaced, never deleted while their note exists (deleted notes
+    get an empty vector), so the newest updated_at tells whether anything
+    changed; rows of hard-deleted notes only disappear with their owner.
+    """
+    latest = db.session.query(func.max(NoteEmbedding.updated_at)).filter(
+        NoteEmbedding.user_id == user_id, NoteEmbedding.model == model
+    ).scalar()
+
+    with _indexes_lock:
+        state = _indexes.get((user_id, model))
+        if state is None:
+            state = _UserIndex()
+            _indexes.set((user_id, model), state)
+
+    with state.lock:
+        if latest != state.latest:
+            since = state.latest - timedelta(seconds=SYNC_SETTLE_SECONDS) if state.latest else None
+            for rows in _load_rows(user_id, model, since):
+                state.apply(rows)
+            state.latest = latest
+    return state.index
+
+
+def _query_vector(query):
+    key = (model_name(), query)
+    vector = _query_vectors.get(key)
+    if vector is None:
+        vector = embed([query])[0]
+        _query_vectors.set(key, vector)
+    return vector
+
+
+def search(query, user_id, limit):
+    """Notes of `user_id` closest in meaning to `query`, best first.
+
+    Results have the shape of src/search.py's: `rank` is the cosine
+    similarity and `snippet` the start of the content.
+    """
+    model = model_name()
+    index = _user_index(user_id, model)
+    # Vectors of deleted notes may linger until their refresh job has run
+    ids, scores = index.search(_query_vector(query), limit * 2)
+    if not len(ids):
+        return []
+
+    # Looked up by primary key only: with the owner in the WHERE clause SQLite
+    # prefers the user_id index and walks every note of the user instead
+    rows = db.session.query(
+        Note.id, Note.title, func.substr(Note.content, 1, PREVIEW_LENGTH).label('snippet'),
+        Note.created_at, Note.updated_at, Note.user_id, Note.deleted_at,
+    ).filter(Note.id.in_(ids.tolist())).all()
+    found = {row.id: row for row in rows if row.user_id == user_id and row.deleted_at is None}
+
+    results = []
+    for note_id, score in zip(ids.tolist(), scores.tolist()):
+        row = found.get(note_id)
+        if row is not None:
+            results.append({
+                'id': row.id,
+                'title': row.title,
+                'snippet': row.snippet,
+                'rank': round(score, 4),
+                'created_at': row.created_at,
+                'updated_at': row.updated_at,
+            })
+        if len(results) == limit:
+            break
+    return results
+
+
+def clear():
+    """Drop the in-memory indexes and query vectors."""
+    _indexes.clear()
+    _query_vectors.clear()
@@ -0,0 +1,193 @@
+"""Database-backed background job queue.
+
+Request handlers enqueue jobs and return immediately; workers claim queued
+rows, run the registered handler for the job's kind and store the result.
+Between jobs they also drain the note change outbox (src/changes.py).
+Workers run either as threads inside the web process (JOB_WORKER_MODE=
+inprocess, started on first use; the default except on Vercel) or as a
+separate process:
+
+    python -m src.worker
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+from src import changes, llm, translation
+from src.models.job import Job, db
+from src.models.note import Note
+
+# No threads outliving the request on serverless: jobs wait for src.worker there
+WORKER_MODE = os.getenv('JOB_WORKER_MODE') or ('external' if os.getenv('VERCEL') else 'inprocess')
+WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', '2'))
+POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+# A running job whose worker has not finished it after this long is re-queued
+LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '600'))
+RETRY_DELAY = float(os.getenv('JOB_RETRY_DELAY', '5'))
+
+HANDLERS = {}
+
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def handler(kind):
+    """Register the decorated function as the handler for jobs of `kind`."""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def _note_content(payload):
+    content = payload.get('content')
+    if not content and payload.get('note_id'):
+        note = Note.live(payload.get('user_id')).filter_by(id=payload['note_id']).first()
+        if not note:
+            raise LookupError('note not found')
+        content = note.content
+    return content
+
+
+@handler('translate')
+def _run_translate(payload):
+    translated, cached = translation.translate(
+        _note_content(payload),
+        source_lang=payload.get('source_lang', 'English'),
+        target_lang=payload.get('target_lang', 'Chinese'),
+        note_id=payload.get('note_id'),
+    )
+    return {'translation': translated, 'cached': cached}
+
+
+@handler('complete')
+def _run_complete(payload):
+    return {'completion': llm.complete_text(_note_content(payload))}
+
+
+def enqueue(kind, payload, max_attempts=3):
+    """Queue a job and commit it. Returns the Job."""
+    if kind not in HANDLERS:
+        raise ValueError(f'unknown job kind: {kind}')
+    job = Job(kind=kind, payload=payload, max_attempts=max_attempts)
+    db.session.add(job)
+    db.session.commit()
+    notify()
+    return job
+
+
+def notify():
+    """Wake the workers for new work, starting them first in inprocess mode."""
+    _wakeup.set()
+    if WORKER_MODE == 'inprocess':
+        start_workers(current_app._get_current_object())
+
+
+def claim(worker_id):
+    """Atomically take the next runnable job for `worker_id`, or return None.
+
+    The candidate row is selected with FOR UPDATE SKIP LOCKED where the
+    database supports it, and taken with a conditional UPDATE so two
+    workers can never both claim it.
+    """
+    now = datetime.utcnow()
+    runnable = or_(
+        (Job.status == 'queued') & (Job.run_after <= now),
+        (Job.status == 'running') & (Job.locked_at < now - timedelta(seconds=LOCK_TIMEOUT)),
+    )
+    candidate = db.session.query(Job.id, Job.status).filter(runnable).order_by(Job.id).limit(1)
+    if db.engine.dialect.name == 'postgresql':
+        candidate = candidate.with_for_update(skip_locked=True)
+    row = candidate.first()
+    if row is None:
+        db.session.rollback()
+        return None
+
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == row.id, Job.status == row.status, runnable)
+        .values(status='running', locked_by=worker_id, locked_at=now, started_at=now,
+                attempts=Job.attempts + 1)
+    )
+    db.session.commit()
+    if claimed.rowcount != 1:
+        return None
+    return db.session.get(Job, row.id)
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome."""
+    try:
+        result = HANDLERS[job.kind](job.payload or {})
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.error = str(e)
+        job.locked_by = None
+        if job.attempts < job.max_attempts and not isinstance(e, LookupError):
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_DELAY * job.attempts)
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return job
+
+    job.status = 'succeeded'
+    job.result = result
+    job.error = None
+    job.locked_by = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def run_pending(worker_id=None, max_jobs=None):
+    """Process runnable jobs until the queue is empty or max_jobs ran. Returns the count."""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim(worker_id)
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def _worker_loop(app, worker_id, stop):
+    while not stop.is_set():
+        try:
+            with app.app_context():
+                processed = run_pending(worker_id) + changes.process_pending()
+                db.session.remove()
+        except Exception as e:
+            app.logger.exception('job worker %s failed: %s', worker_id, e)
+            processed = 0
+        if not processed:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+
+
+def start_workers(app, threads=None, stop=None):
+    """Start worker threads for `app` once per process. Returns the threads."""
+    with _workers_lock:
+        if _workers:
+            return list(_workers)
+        stop = stop or threading.Event()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        for n in range(threads or WORKER_THREADS):
+            thread = threading.Thread(
+                target=_worker_loop,
+                args=(app, f'{prefix}:{n}', stop),
+                name=f'job-worker-{n}',
+                daemon=True,
+            )
+            thread.start()
+            _workers.append(thread)
+        return list(_workers)
@@ -1,61 +1,442 @@
+import asyncio
+import contextvars
+import hashlib
+import json
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
-# Load .env file from project root if present
-load_dotenv()
+# httpx and the openai SDK are imported on first use: together they cost a
+# few hundred milliseconds, which every cold start would otherwise pay.
+
+if __name__ == "__main__":
+    # Entry points load .env before importing this module; running it directly needs it here
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 # Prefer OPENAI_API_KEY, fall back to github_token for backwards compatibility
 API_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("github_token")
 API_BASE = os.getenv("OPENAI_API_BASE", "https://models.github.ai/inference")
-DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "openai/gpt-4.1-mini")
+TRANSLATE_MODEL = os.getenv("OPENAI_TRANSLATE_MODEL", DEFAULT_MODEL)
+COMPLETE_MODEL = os.getenv("OPENAI_COMPLETE_MODEL", DEFAULT_MODEL)
+EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "openai/text-embedding-3-small")
 
+# Bump whenever the translation prompt or parameters change so cached
+# translations produced by the old prompt stop matching.
+TRANSLATE_PROMPT_VERSION = 1
 
-def _get_client():
-    if not API_KEY:
-        raise RuntimeError(
-            "OpenAI API key not found. Set OPENAI_API_KEY or github_token environment variable."
-        )
-    kwargs = {"api_key": API_KEY}
-    if API_BASE:
-        kwargs["base_url"] = API_BASE
-    return OpenAI(**kwargs)
+# Connection pool and retry settings shared by every model
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+RETRY_BACKOFF_MAX = float(os.getenv("LLM_RETRY_BACKOFF_MAX", "8"))
+# Client-side cap on upstream requests per minute (0 = no cap)
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+# Async (ASGI) mode: upstream calls in flight per process; set to what the
+# upstream account can serve, callers beyond it wait for a free slot
+ASYNC_CONCURRENCY = int(os.getenv("LLM_ASYNC_CONCURRENCY", "200"))
+# Concurrent identical calls (same model, messages or inputs, and parameters)
+# share one upstream request instead of each making their own
+COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
 
+# Long-document translation: notes are split into chunks of at most this many
+# (estimated) tokens and the chunks are translated concurrently.
+TRANSLATE_CHUNK_TOKENS = int(os.getenv("LLM_TRANSLATE_CHUNK_TOKENS", "800"))
+TRANSLATE_MAX_TOKENS = int(os.getenv("LLM_TRANSLATE_MAX_TOKENS", "2000"))
+TRANSLATE_WORKERS = int(os.getenv("LLM_TRANSLATE_WORKERS", "4"))
 
-def translate_text(text: str, source_lang: str = "English", target_lang: str = "Chinese") -> str:
-    """Translate text from source_lang to target_lang using the LLM.
+# Per-model overrides as JSON, e.g.
+#   LLM_MODEL_CONFIG='{"openai/gpt-4.1": {"timeout": 120, "max_retries": 4}}'
+# Recognised keys: base_url, api_key, timeout, max_retries.
+MODEL_CONFIG = json.loads(os.getenv("LLM_MODEL_CONFIG") or "{}")
 
-    Returns the translated string.
-    """
-    if not text:
-        return ""
 
-    # Use shared client configuration
-    token = os.getenv("github_token")
-    endpoint = "https://models.github.ai/inference"
-    model = "openai/gpt-4.1-mini"
+def _retryable_errors():
+    import openai
 
-    client = OpenAI(
-        base_url=endpoint,
-        api_key=token,
+    return (
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
     )
 
-    system_prompt = (
-        f"You are a precise translation assistant. Translate the user's text from {source_lang} to {target_lang}. "
-        "Preserve meaning and formatting. Do not add commentary — return only the translation."
-    )
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": text},
-    ]
+class LLMClientManager:
+    """Process-wide owner of the LLM clients.
+
+    All clients share one keep-alive httpx connection pool, so concurrent
+    requests reuse TLS connections instead of handshaking on every call.
+    One client is kept per (base_url, api_key) pair; models that share an
+    endpoint share a client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._clients = {}
+        self._async_http_client = None
+        self._async_clients = {}
+
+    def model_config(self, model):
+        config = {
+            "base_url": API_BASE,
+            "api_key": API_KEY,
+            "timeout": REQUEST_TIMEOUT,
+            "max_retries": MAX_RETRIES,
+        }
+        config.update(MODEL_CONFIG.get(model, {}))
+        return config
+
+    def _get_http_client(self):
+        if self._http_client is None:
+            import httpx
+
+            self._http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=POOL_SIZE,
+                    max_keepalive_connections=POOL_SIZE,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+        return self._http_client
+
+    def get_client(self, model=None):
+        config = self.model_config(model or DEFAULT_MODEL)
+        if not config["api_key"]:
+            raise RuntimeError(
+                "OpenAI API key not found. Set OPENAI_API_KEY or github_token environment variable."
+            )
+        key = (config["base_url"], config["api_key"])
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    from openai import OpenAI
+
+                    kwargs = {
+                        "api_key": config["api_key"],
+                        "http_client": self._get_http_client(),
+                        # Retries are handled by call_with_retries so the backoff is configurable
+                        "max_retries": 0,
+                    }
+                    if config["base_url"]:
+                        kwargs["base_url"] = config["base_url"]
+                    client = OpenAI(**kwargs)
+                    self._clients[key] = client
+        return client
+
+    def get_async_client(self, model=None):
+        """AsyncOpenAI counterpart of get_client, for the ASGI app's event loop.
+
+        The async connection pool belongs to the loop that first used it, so
+        only call this from that one loop (one per ASGI worker process).
+        """
+        config = self.model_config(model or DEFAULT_MODEL)
+        if not config["api_key"]:
+            raise RuntimeError(
+                "OpenAI API key not found. Set OPENAI_API_KEY or github_token environment variable."
+            )
+        key = (config["base_url"], config["api_key"])
+        client = self._async_clients.get(key)
+        if client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=ASYNC_CONCURRENCY,
+                        max_keepalive_connections=min(ASYNC_CONCURRENCY, POOL_SIZE * 5),
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                )
+            kwargs = {"api_key": config["api_key"], "http_client": self._async_http_client, "max_retries": 0}
+            if config["base_url"]:
+                kwargs["base_url"] = config["base_url"]
+            client = AsyncOpenAI(**kwargs)
+            self._async_clients[key] = client
+        return client
+
+    def close(self):
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._clients = {}
+            # The async pool is closed with its event loop (see aclose)
+            self._async_http_client = None
+            self._async_clients = {}
+
+    async def aclose(self):
+        """Close the async connection pool; call from the loop that used it."""
+        http_client = self._async_http_client
+        self._async_http_client = None
+        self._async_clients = {}
+        if http_client is not None:
+            await http_client.aclose()
+
+
+_manager = LLMClientManager()
+
+
+async def aclose():
+    """Close the async LLM connections (ASGI shutdown)."""
+    await _manager.aclose()
+
+
+def _get_client(model=None):
+    return _manager.get_client(model)
+
+
+def _retry_delay(error, attempt):
+    """Honour Retry-After when the server sends one, else exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after", ""))
+            if 0 < retry_after <= RETRY_BACKOFF_MAX * 4:
+                return retry_after
+        except ValueError:
+            pass
+    delay = min(RETRY_BACKOFF * (2 ** attempt), RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.0)
+
+
+class RateLimiter:
+    """Token bucket shared by every upstream call in the process.
+
+    Allows `rate_per_minute` requests per minute with bursts of up to
+    `burst`; a rate of 0 disables the cap. After a 429 the whole process
+    cools down (penalize) instead of each worker retrying on its own.
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst or max(int(rate_per_minute / 60.0 * 5), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self):
+        """Take a token if one is available; returns 0, or the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until > now:
+                return self._blocked_until - now
+            if not self.rate:
+                return 0
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+_rate_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution (threads).
+
+    The first caller runs fn(); callers arriving while it runs wait for
+    its result or exception instead of running fn() themselves.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (fn's result, whether it came from another caller's execution)."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result, False
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop.
 
-    resp = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0.0,
-        top_p=1,
-        max_tokens=2000,
+    The shared call runs as a task of its own, so a caller that is
+    cancelled (its client went away) does not cancel it for the others; it
+    is cancelled once no caller is left waiting.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, factory):
+        """Return (the result of await factory(), whether it came from another caller's call)."""
+        call = self._calls.get(key)
+        shared = call is not None
+        if not shared:
+            call = self._calls[key] = {"task": asyncio.ensure_future(factory()), "waiters": 0}
+            call["task"].add_done_callback(lambda task: self._forget(key, call))
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"]), shared
+        finally:
+            call["waiters"] -= 1
+            if not call["waiters"] and not call["task"].done():
+                call["task"].cancel()
+                self._forget(key, call)
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+# model -> {"upstream": calls made, "coalesced": calls answered by another's call}
+_flight_counts = {}
+_flight_counts_lock = threading.Lock()
+
+
+def _flight_key(model, kind, *request):
+    encoded = json.dumps([model, kind, *request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _count_flight(model, shared):
+    with _flight_counts_lock:
+        counts = _flight_counts.setdefault(model, {"upstream": 0, "coalesced": 0})
+        counts["coalesced" if shared else "upstream"] += 1
+
+
+def _single_flight(model, key, fn):
+    if not COALESCE:
+        return fn()
+    result, shared = _flights.do(key, fn)
+    _count_flight(model, shared)
+    return result
+
+
+async def _single_flight_async(model, key, factory):
+    if not COALESCE:
+        return await factory()
+    result, shared = await _async_flights.do(key, factory)
+    _count_flight(model, shared)
+    return result
+
+
+def coalesce_stats():
+    """{model: {"upstream": n, "coalesced": n}} of the calls made through single-flight."""
+    with _flight_counts_lock:
+        return {model: dict(counts) for model, counts in _flight_counts.items()}
+
+# Called as fn(model, kind, seconds, usage=None, error=None) after every
+# upstream call; src/metrics.py records latency and token counts this way
+_call_listeners = []
+
+
+def on_call(fn):
+    """Register `fn` to be told about every upstream LLM call."""
+    _call_listeners.append(fn)
+    return fn
+
+
+def _notify(model, kind, started, usage=None, error=None):
+    seconds = time.perf_counter() - started
+    for listener in _call_listeners:
+        listener(model, kind, seconds, usage=usage, error=error)
+
+
+def call_with_retries(fn, max_retries):
+    """Call fn(), retrying transient upstream failures up to max_retries times."""
+    import openai
+
+    retryable = _retryable_errors()
+    attempt = 0
+    while True:
+        _rate_limiter.acquire()
+        try:
+            return fn()
+        except retryable as e:
+            if attempt >= max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                # acquire() sleeps out the cooldown for every caller
+                _rate_limiter.penalize(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+def _create_chat_completion(model, messages, params):
+    client = _get_client(model)
+    config = _manager.model_config(model)
+
+    started = time.perf_counter()
+    try:
+        resp = call_with_retries(
+            lambda: client.chat.completions.create(
+                model=model, messages=messages, timeout=config["timeout"], **params
+            ),
+            config["max_retries"],
+        )
+    except Exception as e:
+        _notify(model, "chat", started, error=e)
+        raise
+    _notify(model, "chat", started, usage=getattr(resp, "usage", None))
+    return resp
+
+
+def chat_completion(model, messages, **params):
+    """Run a chat completion on the shared client and return the stripped text.
+
+    Identical calls made while one is in flight share its response.
+    """
+    model = model or DEFAULT_MODEL
+    resp = _single_flight(
+        model, _flight_key(model, "chat", messages, params),
+        lambda: _create_chat_completion(model, messages, params),
     )
 
     try:
@@ -65,34 +446,298 @@ def translate_text(text: str, source_lang: str = "English", target_lang: str = "
         raise RuntimeError(f"Unexpected LLM response format: {resp}")
 
 
-if __name__ == "__main__":
-    sample = "What is the capital of France?"
+def embed_texts(texts, model=None, dimensions=None):
+    """Embedding vectors (lists of floats) of `texts`, in order, from one API call.
+
+    `dimensions` asks models that support it (text-embedding-3-*) for
+    shortened vectors.
+    """
+    model = model or EMBED_MODEL
+    texts = list(texts)
+    return _single_flight(
+        model, _flight_key(model, "embed", texts, dimensions),
+        lambda: _create_embeddings(model, texts, dimensions),
+    )
+
+
+def _create_embeddings(model, texts, dimensions):
+    client = _get_client(model)
+    config = _manager.model_config(model)
+    # Sent as a raw body field: older SDK versions lack the parameter
+    params = {"extra_body": {"dimensions": dimensions}} if dimensions else {}
+
+    started = time.perf_counter()
     try:
-        print("Translating sample...")
-        print(translate_text(sample, source_lang="English", target_lang="Chinese"))
+        resp = call_with_retries(
+            lambda: client.embeddings.create(
+                model=model, input=texts, timeout=config["timeout"], **params
+            ),
+            config["max_retries"],
+        )
     except Exception as e:
-        print("Error:", e)
+        _notify(model, "embed", started, error=e)
+        raise
+    _notify(model, "embed", started, usage=getattr(resp, "usage", None))
+    return [item.embedding for item in sorted(resp.data, key=lambda item: item.index)]
 
 
-def complete_text(prefix: str, max_tokens: int = 200, model: str = None) -> str:
-    """Complete the user's partial text using the LLM and return the completed text.
+def stream_chat_completion(model, messages, **params):
+    """Run a streaming chat completion, yielding text deltas as they arrive.
 
-    prefix: partial user content to complete
-    max_tokens: max tokens to generate
-    model: optional model override
+    Only opening the stream is retried; once tokens have been yielded a
+    failure propagates. Closing the generator (e.g. when the HTTP client
+    disconnects) closes the upstream response so generation stops.
     """
-    if not prefix:
-        return ""
+    model = model or DEFAULT_MODEL
+    client = _get_client(model)
+    config = _manager.model_config(model)
+
+    started = time.perf_counter()
+    try:
+        stream = call_with_retries(
+            lambda: client.chat.completions.create(
+                model=model, messages=messages, timeout=config["timeout"], stream=True, **params
+            ),
+            config["max_retries"],
+        )
+    except Exception as e:
+        _notify(model, "stream", started, error=e)
+        raise
+    error = None
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        stream.response.close()
+        # Timed to the end of the stream (or the client going away)
+        _notify(model, "stream", started, error=error)
+
+
+# Async (ASGI) counterparts. Calls hold a slot of a per-process semaphore
+# while in flight, so concurrency is bounded by ASYNC_CONCURRENCY rather
+# than by worker threads.
+
+_async_slots = None
+
+
+def _get_async_slots():
+    global _async_slots
+    if _async_slots is None:
+        _async_slots = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    return _async_slots
+
+
+async def call_with_retries_async(fn, max_retries):
+    """call_with_retries for coroutine functions; backoff sleeps do not block the loop."""
+    import openai
+
+    retryable = _retryable_errors()
+    attempt = 0
+    while True:
+        await _rate_limiter.acquire_async()
+        try:
+            return await fn()
+        except retryable as e:
+            if attempt >= max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                _rate_limiter.penalize(delay)
+            else:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def _create_chat_completion_async(model, messages, params):
+    client = _manager.get_async_client(model)
+    config = _manager.model_config(model)
+
+    async with _get_async_slots():
+        started = time.perf_counter()
+        try:
+            resp = await call_with_retries_async(
+                lambda: client.chat.completions.create(
+                    model=model, messages=messages, timeout=config["timeout"], **params
+                ),
+                config["max_retries"],
+            )
+        except Exception as e:
+            _notify(model, "chat", started, error=e)
+            raise
+    _notify(model, "chat", started, usage=getattr(resp, "usage", None))
+    return resp
+
+
+async def chat_completion_async(model, messages, **params):
+    """Async chat_completion on the shared AsyncOpenAI client, coalesced the same way."""
+    model = model or DEFAULT_MODEL
+    resp = await _single_flight_async(
+        model, _flight_key(model, "chat", messages, params),
+        lambda: _create_chat_completion_async(model, messages, params),
+    )
+
+    try:
+        return resp.choices[0].message.content.strip()
+    except Exception:
+        raise RuntimeError(f"Unexpected LLM response format: {resp}")
+
+
+async def stream_chat_completion_async(model, messages, **params):
+    """Async stream_chat_completion; the slot is held until the stream ends or is closed."""
+    model = model or DEFAULT_MODEL
+    client = _manager.get_async_client(model)
+    config = _manager.model_config(model)
+
+    async with _get_async_slots():
+        started = time.perf_counter()
+        try:
+            stream = await call_with_retries_async(
+                lambda: client.chat.completions.create(
+                    model=model, messages=messages, timeout=config["timeout"], stream=True, **params
+                ),
+                config["max_retries"],
+            )
+        except Exception as e:
+            _notify(model, "stream", started, error=e)
+            raise
+        error = None
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await stream.response.aclose()
+            _notify(model, "stream", started, error=error)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Shared worker pool bounding concurrent chunk translations per process."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=TRANSLATE_WORKERS, thread_name_prefix="llm-translate"
+                )
+    return _executor
+
+
+_PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+_LINE_BREAK = re.compile(r"(\n)")
+_SENTENCE_BREAK = re.compile(r"((?<=[.!?。！？；;])\s+|(?<=[。！？；]))")
+_FENCE = re.compile(r"^\s*(```|~~~)", re.MULTILINE)
 
-    token = os.getenv("github_token")
-    endpoint = "https://models.github.ai/inference"
-    model = "openai/gpt-4.1-mini"
 
-    client = OpenAI(
-        base_url=endpoint,
-        api_key=token,
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 characters per token for ASCII, 1 per other character."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _split_on(pattern, text):
+    """Split text into (piece, separator) pairs; joining them yields text again."""
+    parts = pattern.split(text)
+    pieces = parts[0::2]
+    separators = parts[1::2] + [""]
+    return [(piece, sep) for piece, sep in zip(pieces, separators) if piece or sep]
+
+
+def _merge_code_fences(blocks):
+    """Re-join paragraphs that sit inside one fenced code block."""
+    merged = []
+    open_fence = False
+    for piece, sep in blocks:
+        if open_fence:
+            prev_piece, prev_sep = merged[-1]
+            merged[-1] = (prev_piece + prev_sep + piece, sep)
+        else:
+            merged.append((piece, sep))
+        if len(_FENCE.findall(piece)) % 2:
+            open_fence = not open_fence
+    return merged
+
+
+def _split_oversized(piece, budget):
+    """Break a single block above the budget on lines, then sentences, then characters."""
+    for pattern in (_LINE_BREAK, _SENTENCE_BREAK):
+        parts = _split_on(pattern, piece)
+        if len(parts) > 1:
+            return _pack(parts, budget)
+    chars_per_token = len(piece) / estimate_tokens(piece)
+    step = max(int(budget * chars_per_token), 1)
+    return [(piece[i:i + step], "") for i in range(0, len(piece), step)]
+
+
+def _pack(blocks, budget):
+    """Greedily pack consecutive (piece, separator) blocks into chunks within the budget."""
+    chunks = []
+    current, current_sep, current_tokens = "", "", 0
+    for piece, sep in blocks:
+        tokens = estimate_tokens(piece)
+        if tokens > budget:
+            # A pending separator alone (text starting with one) must be flushed too
+            if current or current_sep:
+                chunks.append((current, current_sep))
+                current, current_sep, current_tokens = "", "", 0
+            pieces = _split_oversized(piece, budget)
+            last_piece, last_sep = pieces.pop()
+            chunks.extend(pieces)
+            chunks.append((last_piece, last_sep + sep))
+            continue
+        if current and current_tokens + tokens > budget:
+            chunks.append((current, current_sep))
+            current, current_sep, current_tokens = "", "", 0
+        current += current_sep + piece
+        current_sep = sep
+        current_tokens += tokens
+    if current or current_sep:
+        chunks.append((current, current_sep))
+    return chunks
+
+
+def split_into_chunks(text: str, token_budget: int = None):
+    """Split text on paragraph/markdown boundaries into token-budgeted chunks.
+
+    Returns a list of (chunk, separator) pairs such that concatenating
+    chunk + separator over the list reproduces the original text. Fenced
+    code blocks are never split across paragraphs.
+    """
+    budget = token_budget or TRANSLATE_CHUNK_TOKENS
+    blocks = _merge_code_fences(_split_on(_PARAGRAPH_BREAK, text))
+    return _pack(blocks, budget)
+
+
+def _translate_request(text, source_lang, target_lang):
+    system_prompt = (
+        f"You are a precise translation assistant. Translate the user's text from {source_lang} to {target_lang}. "
+        "Preserve meaning and formatting. Do not add commentary — return only the translation."
     )
 
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": text},
+    ]
+    return messages, {"temperature": 0.0, "top_p": 1, "max_tokens": TRANSLATE_MAX_TOKENS}
+
+
+def _complete_request(prefix, max_tokens):
     system_prompt = (
         "You are a helpful assistant that continues and completes the user's partial content. "
         "When completing, preserve the user's tone, formatting and intent. Do not introduce contradictory facts. "
@@ -103,16 +748,123 @@ def complete_text(prefix: str, max_tokens: int = 200, model: str = None) -> str:
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": prefix},
     ]
+    return messages, {"temperature": 0.7, "top_p": 1, "max_tokens": max_tokens}
+
+
+def translate_text(text: str, source_lang: str = "English", target_lang: str = "Chinese") -> str:
+    """Translate text from source_lang to target_lang using the LLM.
+
+    Returns the translated string.
+    """
+    if not text:
+        return ""
+
+    messages, params = _translate_request(text, source_lang, target_lang)
+    return chat_completion(TRANSLATE_MODEL, messages, **params)
+
+
+def translate_text_stream(text: str, source_lang: str = "English", target_lang: str = "Chinese"):
+    """Streaming variant of translate_text; yields pieces of the translation."""
+    if not text:
+        return
+
+    messages, params = _translate_request(text, source_lang, target_lang)
+    yield from stream_chat_completion(TRANSLATE_MODEL, messages, **params)
+
+
+def submit_translation(text: str, source_lang: str = "English", target_lang: str = "Chinese"):
+    """Schedule translate_text on the shared worker pool and return its Future.
+
+    Runs in a copy of the caller's context, so call listeners still see the
+    request (per-request LLM time in src/metrics.py).
+    """
+    context = contextvars.copy_context()
+    return _get_executor().submit(context.run, translate_text, text, source_lang, target_lang)
+
+
+def translate_chunks(chunks, source_lang: str = "English", target_lang: str = "Chinese"):
+    """Translate a list of texts concurrently, returning translations in input order."""
+    futures = [submit_translation(chunk, source_lang, target_lang) for chunk in chunks]
+    return [future.result() for future in futures]
+
 
-    resp = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0.7,
-        top_p=1,
-        max_tokens=max_tokens,
+def translate_long_text(text: str, source_lang: str = "English", target_lang: str = "Chinese") -> str:
+    """Translate a document of any length by translating its chunks in parallel."""
+    chunks = split_into_chunks(text)
+    translated = translate_chunks(
+        [chunk for chunk, _ in chunks if chunk.strip()], source_lang, target_lang
     )
+    pieces = iter(translated)
+    return "".join(
+        (next(pieces) if chunk.strip() else chunk) + sep for chunk, sep in chunks
+    ).strip()
+
+
+def complete_text(prefix: str, max_tokens: int = 200, model: str = None) -> str:
+    """Complete the user's partial text using the LLM and return the completed text.
+
+    prefix: partial user content to complete
+    max_tokens: max tokens to generate
+    model: optional model override
+    """
+    if not prefix:
+        return ""
+
+    messages, params = _complete_request(prefix, max_tokens)
+    return chat_completion(model or COMPLETE_MODEL, messages, **params)
+
+
+def complete_text_stream(prefix: str, max_tokens: int = 200, model: str = None):
+    """Streaming variant of complete_text; yields pieces of the completion."""
+    if not prefix:
+        return
+
+    messages, params = _complete_request(prefix, max_tokens)
+    yield from stream_chat_completion(model or COMPLETE_MODEL, messages, **params)
+
+
+async def translate_text_async(text: str, source_lang: str = "English", target_lang: str = "Chinese") -> str:
+    """Async translate_text."""
+    if not text:
+        return ""
+
+    messages, params = _translate_request(text, source_lang, target_lang)
+    return await chat_completion_async(TRANSLATE_MODEL, messages, **params)
+
+
+async def translate_text_stream_async(text: str, source_lang: str = "English", target_lang: str = "Chinese"):
+    """Async translate_text_stream."""
+    if not text:
+        return
+
+    messages, params = _translate_request(text, source_lang, target_lang)
+    async for delta in stream_chat_completion_async(TRANSLATE_MODEL, messages, **params):
+        yield delta
+
+
+async def complete_text_async(prefix: str, max_tokens: int = 200, model: str = None) -> str:
+    """Async complete_text."""
+    if not prefix:
+        return ""
 
+    messages, params = _complete_request(prefix, max_tokens)
+    return await chat_completion_async(model or COMPLETE_MODEL, messages, **params)
+
+
+async def complete_text_stream_async(prefix: str, max_tokens: int = 200, model: str = None):
+    """Async complete_text_stream."""
+    if not prefix:
+        return
+
+    messages, params = _complete_request(prefix, max_tokens)
+    async for delta in stream_chat_completion_async(model or COMPLETE_MODEL, messages, **params):
+        yield delta
+
+
+if __name__ == "__main__":
+    sample = "What is the capital of France?"
     try:
-        return resp.choices[0].message.content.strip()
-    except Exception:
-        raise RuntimeError(f"Unexpected LLM response format: {resp}")
\ No newline at end of file
+        print("Translating sample...")
+        print(translate_text(sample, source_lang="English", target_lang="Chinese"))
+    except Exception as e:
+        print("Error:", e)
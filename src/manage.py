@@ -0,0 +1,146 @@
+"""Maintenance commands: python -m src.manage <command>
+
+  migrate          apply pending schema migrations (what DB_AUTO_MIGRATE does on startup)
+  embed            compute missing or outdated note embeddings (semantic search)
+  changes          process the note change outbox (what the job workers do)
+  profile-startup  time a cold start of an entry point, step by step and per import
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def _app():
+    # Schema changes are this tool's job, not a side effect of loading the app
+    os.environ['DB_AUTO_MIGRATE'] = 'false'
+    from src.main import app
+    return app
+
+
+def migrate(args):
+    from src import migrations
+    from src.models.user import db
+
+    app = _app()
+    with app.app_context():
+        if args.status:
+            for migration, applied_at in migrations.status(db.engine):
+                state = f'applied {applied_at:%Y-%m-%d %H:%M:%S}' if applied_at else 'pending'
+                print(f'{migration.version}_{migration.name:<28} {state:<28} {migration.description}')
+            return
+        applied = migrations.upgrade(db.engine, target=args.to)
+    print(f'Applied {len(applied)} migration(s)' if applied else 'Database schema is up to date')
+
+
+def embed(args):
+    from src import embeddings
+    from src.models.note import Note, db
+
+    if not embeddings.enabled():
+        sys.exit(f'EMBEDDING_BACKEND={embeddings.BACKEND!r} names no embedder; set it to one of {", ".join(embeddings.EMBEDDERS)}')
+    app = _app()
+    with app.app_context():
+        if args.user is not None:
+            user_ids = [args.user]
+        else:
+            user_ids = [row.user_id for row in db.session.query(Note.user_id).distinct().order_by(Note.user_id)]
+        total = 0
+        for user_id in user_ids:
+            started = time.perf_counter()
+            embedded = embeddings.refresh(user_id)
+            total += embedded
+            if embedded:
+                print(f'user {user_id}: embedded {embedded} note(s) in {time.perf_counter() - started:.1f} s')
+    print(f'Embedded {total} note(s) with {embeddings.model_name()}')
+
+
+def process_changes(args):
+    from src import changes
+
+    app = _app()
+    with app.app_context():
+        if args.retry:
+            print(f'Retrying {changes.retry_failed()} failed change(s)')
+        handled = changes.process_pending()
+        backlog = changes.backlog()
+    stats = changes.stats()
+    print(f"Processed {handled} change(s): {stats['changed']} changed, {stats['unchanged']} unchanged, "
+          f"{stats['failed']} failed; {backlog['pending']} pending, {backlog['failed']} failed in the outbox")
+
+
+def _run_python(code, env=None):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    return result, time.perf_counter() - started
+
+
+def profile_startup(args):
+    baseline, baseline_seconds = _run_python('pass')
+    result, seconds = _run_python(f'import {args.entry}', env=dict(os.environ, STARTUP_PROFILE='true'))
+    if result.returncode:
+        print(result.stderr, file=sys.stderr)
+        sys.exit(result.returncode)
+
+    # -X importtime lists a module after the modules it imported, indented
+    # two more spaces; keep the direct imports of the entry module
+    imports = []
+    children = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            _, cumulative_us, indent, module = match.groups()
+            if len(indent) == 3:
+                children.append((int(cumulative_us), module))
+            elif len(indent) == 1:
+                if module == args.entry:
+                    imports = children
+                children = []
+        elif not line.startswith('import time:'):
+            print(line)
+
+    print(f'\nInterpreter start: {baseline_seconds * 1000:8.1f} ms')
+    print(f'Cold start of {args.entry}: {seconds * 1000:8.1f} ms')
+    print(f'\nSlowest imports (cumulative, top {args.top}):')
+    for cumulative_us, module in sorted(imports, reverse=True)[:args.top]:
+        print(f'  {module:<40} {cumulative_us / 1000:8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintenance commands.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = commands.add_parser('migrate', help='apply pending schema migrations')
+    migrate_parser.add_argument('--to', metavar='VERSION', help='stop after this version (e.g. 0003)')
+    migrate_parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    migrate_parser.set_defaults(run=migrate)
+
+    embed_parser = commands.add_parser('embed', help='compute missing or outdated note embeddings')
+    embed_parser.add_argument('--user', type=int, help='only the notes of this user id')
+    embed_parser.set_defaults(run=embed)
+
+    changes_parser = commands.add_parser('changes', help='process the note change outbox')
+    changes_parser.add_argument('--retry', action='store_true', help='retry changes that used up their attempts')
+    changes_parser.set_defaults(run=process_changes)
+
+    profile = commands.add_parser('profile-startup', help='time a cold start')
+    profile.add_argument('--entry', default='api.index', help='module to import (default: api.index)')
+    profile.add_argument('--top', type=int, default=15, help='number of imports to list')
+    profile.set_defaults(run=profile_startup)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
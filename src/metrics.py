@@ -0,0 +1,293 @@
+"""Request, SQL and LLM instrumentation, exposed in the Prometheus text format.
+
+`init_app(app)` times every request and serves GET /metrics. SQL statements
+are timed through SQLAlchemy cursor events on every engine, LLM calls
+through `llm.on_call`; cache hit and coalesced LLM call counters are read
+when /metrics is scraped. Each response carries a Server-Timing header, e.g.
+
+    Server-Timing: db;dur=3.1;desc="queries: 4", llm;dur=812.0;desc="calls: 1", app;dur=820.4
+
+so browser dev tools show where a request spent its time. Durations of
+streamed responses cover the time until the response started.
+
+Metrics are kept per process; Prometheus sums them across the instances it
+scrapes. /metrics answers 404 unless METRICS_TOKEN is set (then it
+requires `Authorization: Bearer <token>`) or METRICS_PUBLIC=true opens it
+to anyone who can reach the app, e.g. on a private network. Set
+METRICS_ENABLED=false to switch the instrumentation off.
+"""
+import hmac
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import llm
+
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'true').lower() == 'true'
+TOKEN = os.getenv('METRICS_TOKEN')
+# Per-route traffic and per-user counters: not served without a token unless asked
+PUBLIC = os.getenv('METRICS_PUBLIC', 'false').lower() == 'true'
+
+_llm_stats_lock = threading.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Cumulative histogram with a fixed set of label names."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                yield f'{self.name}_bucket', labels, cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time until the response started, by route.',
+    ('method', 'route', 'status'),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per request, by route.',
+    ('method', 'route'), buckets=QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds', 'SQL statement execution time, by statement kind.', ('operation',),
+)
+LLM_LATENCY = Histogram(
+    'llm_request_duration_seconds', 'Upstream LLM call time including retries.',
+    ('model', 'kind', 'outcome'), buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter('llm_tokens_total', 'Tokens reported by the LLM API.', ('model', 'type'))
+
+METRICS = [REQUEST_LATENCY, REQUEST_QUERIES, DB_QUERY_LATENCY, LLM_LATENCY, LLM_TOKENS]
+
+_collectors = []
+
+
+def collector(fn):
+    """Register a function returning [(name, type, help, [(labels dict, value)])], read on scrape."""
+    _collectors.append(fn)
+    return fn
+
+
+@collector
+def _cache_metrics():
+    from src import note_cache, translation
+
+    translation_stats = translation.stats()
+    caches = {'note': note_cache.stats(), 'translation_memory': translation_stats['memory']}
+    database = translation_stats['database']
+    families = []
+    for field, suffix in (('hits', 'hits'), ('misses', 'misses'), ('evictions', 'evictions')):
+        samples = [({'cache': name}, stats[field]) for name, stats in caches.items() if field in stats]
+        samples.append(({'cache': 'translation_database'}, database[f'db_{field}']))
+        families.append((f'cache_{suffix}_total', 'counter', f'Cache {suffix} since the process started.', samples))
+    return families
+
+
+@collector
+def _coalesce_metrics():
+    samples = [
+        ({'model': model, 'outcome': outcome}, count)
+        for model, counts in sorted(llm.coalesce_stats().items())
+        for outcome, count in counts.items()
+    ]
+    return [('llm_singleflight_calls_total', 'counter',
+             'LLM calls by whether they made an upstream request or shared one already in flight.', samples)]
+
+
+@collector
+def _change_metrics():
+    from src import changes
+
+    samples = [({'outcome': outcome}, count) for outcome, count in changes.stats().items()]
+    return [('note_changes_total', 'counter', 'Note change outbox rows handled by this process.', samples)]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in metric.samples())
+    for fn in _collectors:
+        for name, type_, help, samples in fn():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {type_}')
+            for labels, value in samples:
+                label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                lines.append(f'{name}{label_text} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _request_stats():
+    # Per-request totals live on flask.g; work outside a request (job
+    # workers, CLI) is only counted globally
+    if not has_request_context() or 'metrics_started' not in g:
+        return None
+    return g.metrics
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_query_started'].pop()
+    seconds = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    DB_QUERY_LATENCY.observe(seconds, operation=operation)
+    stats = _request_stats()
+    if stats is not None:
+        stats['db_count'] += 1
+        stats['db_seconds'] += seconds
+
+
+def _handle_error(exception_context):
+    # The statement failed: drop its start time so the stack stays balanced
+    started = exception_context.connection.info.get('metrics_query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _on_llm_call(model, kind, seconds, usage=None, error=None):
+    LLM_LATENCY.observe(seconds, model=model, kind=kind, outcome='error' if error else 'ok')
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, 'prompt_tokens', 0) or 0, model=model, type='prompt')
+        LLM_TOKENS.inc(getattr(usage, 'completion_tokens', 0) or 0, model=model, type='completion')
+    stats = _request_stats()
+    if stats is not None:
+        # Chunk translations of one request report from several pool threads
+        with _llm_stats_lock:
+            stats['llm_count'] += 1
+            stats['llm_seconds'] += seconds
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics = {'db_count': 0, 'db_seconds': 0.0, 'llm_count': 0, 'llm_seconds': 0.0}
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+
+def _after_request(response):
+    if 'metrics_started' not in g:
+        return response
+    seconds = time.perf_counter() - g.metrics_started
+    stats = g.metrics
+    route = _route()
+    REQUEST_LATENCY.observe(seconds, method=request.method, route=route, status=response.status_code)
+    REQUEST_QUERIES.observe(stats['db_count'], method=request.method, route=route)
+
+    if SERVER_TIMING:
+        timings = [f'db;dur={stats["db_seconds"] * 1000:.1f};desc="queries: {stats["db_count"]}"']
+        if stats['llm_count']:
+            timings.append(f'llm;dur={stats["llm_seconds"] * 1000:.1f};desc="calls: {stats["llm_count"]}"')
+        timings.append(f'app;dur={seconds * 1000:.1f}')
+        response.headers.add('Server-Timing', ', '.join(timings))
+    return response
+
+
+def metrics_endpoint():
+    if TOKEN:
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {TOKEN}'.encode()):
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+    elif not PUBLIC:
+        return Response('not found\n', status=404, mimetype='text/plain')
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+if ENABLED:
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    llm.on_call(_on_llm_call)
+
+
+def init_app(app):
+    """Time the requests of `app` and serve GET /metrics."""
+    if not ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
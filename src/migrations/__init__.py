@@ -0,0 +1,199 @@
+"""Versioned schema migrations.
+
+Each module `vNNNN_name.py` in this package is one migration: a docstring
+describing it, an `upgrade(ctx)` function, and optionally
+`transactional = False` for steps that cannot run inside a transaction
+(CREATE INDEX CONCURRENTLY). Migrations are applied in version order and
+recorded in the `schema_migrations` table; every step is written to be
+safe on databases whose tables were created by the old db.create_all()
+startup, so existing deployments upgrade in place.
+
+    python -m src.manage migrate            # apply pending migrations
+    python -m src.manage migrate --status   # list applied / pending
+
+On Postgres the runner holds an advisory lock, so concurrent deploys apply
+each migration once. Run it over a direct connection (port 5432), not the
+transaction pooler: session locks and CONCURRENTLY need a session.
+"""
+import importlib
+import pkgutil
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import sqlalchemy as sa
+
+VERSION_TABLE = 'schema_migrations'
+# Arbitrary constant naming this app's migration lock
+ADVISORY_LOCK_ID = 7310457
+
+_MODULE_NAME = re.compile(r'^v(\d{4})_(\w+)$')
+
+_versions = sa.Table(
+    VERSION_TABLE,
+    sa.MetaData(),
+    sa.Column('version', sa.String(10), primary_key=True),
+    sa.Column('name', sa.String(100), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+    sa.Column('duration_ms', sa.Integer, nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    description: str
+    upgrade: object
+    transactional: bool = True
+
+
+class MigrationContext:
+    """What a migration's upgrade() gets: a connection plus idempotent DDL helpers."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.dialect = connection.dialect.name
+
+    def execute(self, statement, params=None):
+        if isinstance(statement, str):
+            statement = sa.text(statement)
+        return self.connection.execute(statement, params or {})
+
+    def _inspector(self):
+        # Fresh each time: earlier steps of the same migration change the schema
+        return sa.inspect(self.connection)
+
+    def has_table(self, table):
+        return self._inspector().has_table(table)
+
+    def has_column(self, table, column):
+        return any(c['name'] == column for c in self._inspector().get_columns(table))
+
+    def has_index(self, table, index):
+        return any(i['name'] == index for i in self._inspector().get_indexes(table))
+
+    def type_sql(self, type_):
+        """DDL spelling of a SQLAlchemy type on this database."""
+        return type_.compile(dialect=self.connection.dialect)
+
+    def create_table(self, table):
+        """Create a sa.Table (with its indexes) unless it already exists."""
+        table.create(self.connection, checkfirst=True)
+
+    def add_column(self, table, column, ddl):
+        """ALTER TABLE ... ADD COLUMN `column` `ddl` unless the column exists."""
+        if not self.has_column(table, column):
+            self.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+
+    def create_index(self, name, table, columns, unique=False, using=None, concurrently=False):
+        """Create an index unless it exists.
+
+        `columns` is raw SQL (e.g. "updated_at DESC, id DESC"). With
+        `concurrently` (Postgres, non-transactional migrations only) the
+        table stays writable during the build; an invalid index left by an
+        interrupted concurrent build is dropped and rebuilt.
+        """
+        concurrently = concurrently and self.dialect == 'postgresql'
+        if concurrently:
+            invalid = self.execute(
+                'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                'WHERE c.relname = :name AND NOT i.indisvalid', {'name': name}
+            ).first()
+            if invalid:
+                self.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        elif self.has_index(table, name):
+            return
+        self.execute(
+            f'CREATE {"UNIQUE " if unique else ""}INDEX {"CONCURRENTLY " if concurrently else ""}'
+            f'IF NOT EXISTS {name} ON "{table}"{f" USING {using}" if using else ""} ({columns})'
+        )
+
+    def drop_index(self, name, concurrently=False):
+        """Drop an index if it exists (CONCURRENTLY on Postgres when asked)."""
+        concurrently = concurrently and self.dialect == 'postgresql'
+        self.execute(f'DROP INDEX {"CONCURRENTLY " if concurrently else ""}IF EXISTS {name}')
+
+
+def discover():
+    """All migrations in this package, in version order."""
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{__name__}.{module_info.name}')
+        migrations.append(Migration(
+            version=match.group(1),
+            name=match.group(2),
+            description=(module.__doc__ or '').strip().split('\n')[0],
+            upgrade=module.upgrade,
+            transactional=getattr(module, 'transactional', True),
+        ))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('duplicate migration versions')
+    return sorted(migrations, key=lambda m: m.version)
+
+
+def applied_versions(connection):
+    if not sa.inspect(connection).has_table(VERSION_TABLE):
+        return set()
+    return {row.version for row in connection.execute(sa.select(_versions.c.version))}
+
+
+def status(engine):
+    """[(migration, applied_at or None)] for every known migration."""
+    with engine.connect() as connection:
+        applied = {}
+        if sa.inspect(connection).has_table(VERSION_TABLE):
+            applied = dict(connection.execute(sa.select(_versions.c.version, _versions.c.applied_at)).all())
+    return [(migration, applied.get(migration.version)) for migration in discover()]
+
+
+def _record(connection, migration, started):
+    connection.execute(_versions.insert().values(
+        version=migration.version,
+        name=migration.name,
+        applied_at=datetime.utcnow(),
+        duration_ms=int((time.perf_counter() - started) * 1000),
+    ))
+
+
+def _apply(engine, migration):
+    started = time.perf_counter()
+    if migration.transactional:
+        with engine.begin() as connection:
+            migration.upgrade(MigrationContext(connection))
+            _record(connection, migration, started)
+    else:
+        with engine.connect() as connection:
+            autocommit = connection.execution_options(isolation_level='AUTOCOMMIT')
+            migration.upgrade(MigrationContext(autocommit))
+            _record(autocommit, migration, started)
+
+
+def upgrade(engine, target=None, log=print):
+    """Apply pending migrations up to `target` (inclusive). Returns the versions applied."""
+    migrations = [m for m in discover() if target is None or m.version <= target]
+    with engine.connect() as lock_connection:
+        if engine.dialect.name == 'postgresql':
+            lock_connection.execute(sa.text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+            lock_connection.commit()
+        try:
+            with engine.begin() as connection:
+                _versions.create(connection, checkfirst=True)
+                applied = applied_versions(connection)
+            done = []
+            for migration in migrations:
+                if migration.version in applied:
+                    continue
+                log(f'Applying {migration.version}_{migration.name}: {migration.description}')
+                _apply(engine, migration)
+                done.append(migration.version)
+            return done
+        finally:
+            if engine.dialect.name == 'postgresql':
+                lock_connection.execute(sa.text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+                lock_connection.commit()
@@ -0,0 +1,27 @@
+"""Create the user and note tables."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+user = sa.Table(
+    'user',
+    metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('username', sa.String(80), unique=True, nullable=False),
+    sa.Column('email', sa.String(120), unique=True, nullable=False),
+)
+
+note = sa.Table(
+    'note',
+    metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('title', sa.String(200), nullable=False),
+    sa.Column('content', sa.Text, nullable=False),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('updated_at', sa.DateTime),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(user)
+    ctx.create_table(note)
@@ -0,0 +1,7 @@
+"""Index note (updated_at DESC, id DESC) for keyset-paginated listing."""
+
+transactional = False
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_note_updated_at_id', 'note', 'updated_at DESC, id DESC', concurrently=True)
@@ -0,0 +1,31 @@
+"""Add full-text search structures: a tsvector column on Postgres, FTS5 on SQLite.
+
+On Postgres adding the generated column rewrites the note table under an
+exclusive lock; schedule it for a quiet moment on large tables.
+"""
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5("
+    "title, content, content='note', content_rowid='id', tokenize='unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN "
+    "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE OF title, content ON note BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade(ctx):
+    if ctx.dialect == 'postgresql':
+        ctx.add_column(
+            'note', 'search_vector',
+            "tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')) STORED",
+        )
+    elif ctx.dialect == 'sqlite':
+        for statement in SQLITE_FTS:
+            ctx.execute(statement)
@@ -0,0 +1,8 @@
+"""Build the GIN index over note.search_vector (Postgres) without blocking writes."""
+
+transactional = False
+
+
+def upgrade(ctx):
+    if ctx.dialect == 'postgresql':
+        ctx.create_index('ix_note_search_vector', 'note', 'search_vector', using='GIN', concurrently=True)
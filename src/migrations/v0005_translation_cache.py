@@ -0,0 +1,21 @@
+"""Create the translation_cache table (persistent tier of src/translation.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('note', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+translation_cache = sa.Table(
+    'translation_cache',
+    metadata,
+    sa.Column('key', sa.String(64), primary_key=True),
+    sa.Column('note_id', sa.Integer, sa.ForeignKey('note.id', ondelete='CASCADE'), index=True),
+    sa.Column('model', sa.String(100), nullable=False),
+    sa.Column('translation', sa.Text, nullable=False),
+    sa.Column('created_at', sa.DateTime, nullable=False, index=True),
+    sa.Column('expires_at', sa.DateTime, index=True),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(translation_cache)
@@ -0,0 +1,28 @@
+"""Create the job table backing the background queue (src/jobs.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+job = sa.Table(
+    'job',
+    metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('kind', sa.String(50), nullable=False),
+    sa.Column('payload', sa.JSON, nullable=False),
+    sa.Column('status', sa.String(20), nullable=False),
+    sa.Column('result', sa.JSON),
+    sa.Column('error', sa.Text),
+    sa.Column('attempts', sa.Integer, nullable=False),
+    sa.Column('max_attempts', sa.Integer, nullable=False),
+    sa.Column('run_after', sa.DateTime, nullable=False),
+    sa.Column('locked_by', sa.String(100)),
+    sa.Column('locked_at', sa.DateTime),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('started_at', sa.DateTime),
+    sa.Column('finished_at', sa.DateTime),
+    sa.Index('ix_job_status_run_after_id', 'status', 'run_after', 'id'),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(job)
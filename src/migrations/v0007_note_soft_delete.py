@@ -0,0 +1,6 @@
+"""Add note.deleted_at for tombstones reported by /notes/changes."""
+import sqlalchemy as sa
+
+
+def upgrade(ctx):
+    ctx.add_column('note', 'deleted_at', ctx.type_sql(sa.DateTime()))
@@ -0,0 +1,6 @@
+"""Add note.version for optimistic concurrency control."""
+
+
+def upgrade(ctx):
+    # A constant default: Postgres 11+ adds the column without rewriting the table
+    ctx.add_column('note', 'version', 'INTEGER NOT NULL DEFAULT 1')
@@ -0,0 +1,57 @@
+"""Give every note an owner: note.user_id, backfilled with a default user.
+
+Notes written before ownership existed are assigned to the user named
+`default` (created here), which is also who requests without an X-User-Id
+header act for (see src/tenancy.py).
+
+Not transactional, so the note table is never locked for the whole
+backfill: the column is added (catalog-only), filled in committed batches
+of BACKFILL_BATCH ids, and only then made NOT NULL. Every step is
+idempotent, so an interrupted run is simply run again.
+"""
+import sqlalchemy as sa
+
+DEFAULT_USERNAME = 'default'
+DEFAULT_EMAIL = 'default@localhost'
+BACKFILL_BATCH = 10000
+
+transactional = False
+
+
+def upgrade(ctx):
+    user = sa.table('user', sa.column('id'), sa.column('username'), sa.column('email'))
+    default_id = ctx.execute(sa.select(user.c.id).where(user.c.username == DEFAULT_USERNAME)).scalar()
+    if default_id is None:
+        default_id = ctx.execute(
+            user.insert().values(username=DEFAULT_USERNAME, email=DEFAULT_EMAIL).returning(user.c.id)
+        ).scalar()
+
+    ctx.add_column('note', 'user_id', 'INTEGER REFERENCES "user" (id) ON DELETE CASCADE')
+    if ctx.dialect == 'postgresql':
+        # Rows that app instances still on the old code insert during the
+        # backfill are owned from the start (a catalog-only change)
+        ctx.execute(f'ALTER TABLE note ALTER COLUMN user_id SET DEFAULT {int(default_id)}')
+
+    # By id range, each batch its own short transaction
+    max_id = ctx.execute('SELECT max(id) FROM note').scalar() or 0
+    for low in range(0, max_id, BACKFILL_BATCH):
+        ctx.execute(
+            'UPDATE note SET user_id = :user_id WHERE user_id IS NULL AND id > :low AND id <= :high',
+            {'user_id': default_id, 'low': low, 'high': low + BACKFILL_BATCH},
+        )
+
+    if ctx.dialect == 'postgresql':
+        # VALIDATE scans the table under a lock that lets writes through, and
+        # the validated CHECK lets SET NOT NULL skip its own scan under the
+        # exclusive lock (Postgres 12+), which is then held only briefly
+        exists = ctx.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'note_user_id_not_null'"
+        ).first()
+        if not exists:
+            ctx.execute(
+                'ALTER TABLE note ADD CONSTRAINT note_user_id_not_null CHECK (user_id IS NOT NULL) NOT VALID'
+            )
+        ctx.execute('ALTER TABLE note VALIDATE CONSTRAINT note_user_id_not_null')
+        ctx.execute('ALTER TABLE note ALTER COLUMN user_id SET NOT NULL')
+        ctx.execute('ALTER TABLE note DROP CONSTRAINT note_user_id_not_null')
+        ctx.execute('ALTER TABLE note ALTER COLUMN user_id DROP DEFAULT')
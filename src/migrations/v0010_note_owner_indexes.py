@@ -0,0 +1,21 @@
+"""Lead the note listing and search indexes with user_id.
+
+Listing, the changes feed and search are always filtered by owner, so their
+cost follows the number of notes of that user rather than the table size.
+The global indexes they replace are dropped once the new ones are built.
+"""
+
+transactional = False
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_note_user_id_updated_at_id', 'note', 'user_id, updated_at DESC, id DESC', concurrently=True)
+    ctx.drop_index('ix_note_updated_at_id', concurrently=True)
+
+    if ctx.dialect == 'postgresql':
+        # btree_gin lets one GIN index cover the owner equality and the tsquery
+        ctx.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+        ctx.create_index(
+            'ix_note_user_id_search_vector', 'note', 'user_id, search_vector', using='GIN', concurrently=True
+        )
+        ctx.drop_index('ix_note_search_vector', concurrently=True)
@@ -0,0 +1,23 @@
+"""Create the note_embedding table (vectors for semantic search, src/embeddings.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('user', metadata, sa.Column('id', sa.Integer, primary_key=True))
+sa.Table('note', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+note_embedding = sa.Table(
+    'note_embedding',
+    metadata,
+    sa.Column('note_id', sa.Integer, sa.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+    sa.Column('model', sa.String(100), nullable=False),
+    sa.Column('content_hash', sa.String(64), nullable=False),
+    sa.Column('vector', sa.LargeBinary, nullable=False),
+    sa.Column('updated_at', sa.DateTime, nullable=False),
+    sa.Index('ix_note_embedding_user_id_model_updated_at', 'user_id', 'model', 'updated_at'),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(note_embedding)
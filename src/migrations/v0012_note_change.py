@@ -0,0 +1,24 @@
+"""Add note.content_hash and the note_change outbox (change capture, src/changes.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('note', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+note_change = sa.Table(
+    'note_change',
+    metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('note_id', sa.Integer, sa.ForeignKey('note.id', ondelete='CASCADE'), nullable=False),
+    sa.Column('attempts', sa.Integer, nullable=False),
+    sa.Column('run_after', sa.DateTime, nullable=False),
+    sa.Column('error', sa.Text),
+    sa.Column('created_at', sa.DateTime),
+    sa.Index('ix_note_change_note_id', 'note_id'),
+)
+
+
+def upgrade(ctx):
+    # Nullable without a default: no table rewrite; NULL means never processed
+    ctx.add_column('note', 'content_hash', 'VARCHAR(64)')
+    ctx.create_table(note_change)
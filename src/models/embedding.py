@@ -0,0 +1,30 @@
+from datetime import datetime
+from src.models.user import db
+
+
+class NoteEmbedding(db.Model):
+    """Embedding of a note's title and content (see src/embeddings.py).
+
+    Kept out of the note table so note reads never load the vectors.
+    """
+
+    __tablename__ = 'note_embedding'
+
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    # Embedder and dimensions that produced the vector; other models' rows are ignored
+    model = db.Column(db.String(100), nullable=False)
+    # sha256 of the embedded text, so unchanged notes are not embedded again
+    content_hash = db.Column(db.String(64), nullable=False)
+    # float32, little-endian
+    vector = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Loading and delta-syncing one user's index (WHERE user_id = ? AND model = ?
+    # [AND updated_at >= ?]) and its freshness check (count, max(updated_at))
+    __table_args__ = (
+        db.Index('ix_note_embedding_user_id_model_updated_at', user_id, model, updated_at),
+    )
+
+    def __repr__(self):
+        return f'<NoteEmbedding {self.note_id}>'
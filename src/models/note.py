@@ -8,16 +8,46 @@ class Note(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set instead of deleting the row, so /notes/changes can report deletions
+    deleted_at = db.Column(db.DateTime)
+    # Bumped by every write; updates may be made conditional on it (If-Match)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Owner; every note query is scoped to one user (see src/tenancy.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    # sha256 of title and content as last processed by src/changes.py ('' once
+    # deleted, NULL before); derived data is only recomputed when it changes
+    content_hash = db.Column(db.String(64))
+
+    # Serves the per-user keyset-paginated listing (WHERE user_id = ?
+    # ORDER BY updated_at DESC, id DESC), the changes feed and the FK
+    __table_args__ = (
+        db.Index('ix_note_user_id_updated_at_id', user_id, updated_at.desc(), id.desc()),
+    )
     
     def __repr__(self):
         return f'<Note {self.title}>'
+
+    @classmethod
+    def live(cls, user_id):
+        """Query over the notes of `user_id` that have not been deleted."""
+        return cls.query.filter(cls.user_id == user_id, cls.deleted_at.is_(None))
+
+    def mark_deleted(self):
+        """Turn the note into a tombstone: keep id and timestamps, drop the body."""
+        now = datetime.utcnow()
+        self.title = ''
+        self.content = ''
+        self.deleted_at = now
+        self.updated_at = now
+        self.version = Note.version + 1
     
     def to_dict(self):
+        # Timestamps stay datetimes; src/serialization.py encodes them as ISO 8601
         return {
             'id': self.id,
             'title': self.title,
             'content': self.content,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'version': self.version
         }
-
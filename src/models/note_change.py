@@ -0,0 +1,23 @@
+from datetime import datetime
+from src.models.user import db
+
+
+class NoteChange(db.Model):
+    """Outbox row: a note was written in the transaction that added it (see src/changes.py)."""
+
+    __tablename__ = 'note_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # The outbox is drained in id order; this one serves the FK's cascade
+    __table_args__ = (
+        db.Index('ix_note_change_note_id', note_id),
+    )
+
+    def __repr__(self):
+        return f'<NoteChange {self.id} note {self.note_id}>'
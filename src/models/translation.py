@@ -0,0 +1,19 @@
+from datetime import datetime
+from src.models.user import db
+
+
+class TranslationCacheEntry(db.Model):
+    """Persistent tier of the translation cache (see src/translation.py)."""
+
+    __tablename__ = 'translation_cache'
+
+    # sha256 over (prompt version, model, languages, content)
+    key = db.Column(db.String(64), primary_key=True)
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), index=True)
+    model = db.Column(db.String(100), nullable=False)
+    translation = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f'<TranslationCacheEntry {self.key[:12]}>'
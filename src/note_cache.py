@@ -0,0 +1,98 @@
+"""Read-through cache of encoded note responses.
+
+GET /notes/<id> and GET /notes pages are cached as the exact bytes sent to
+the client together with their ETag, so a warm read touches neither the
+database nor the JSON encoder. Keys are scoped to the owning user and
+embed a generation token: each note has one, and each user one for their
+list pages. Writes invalidate by dropping the generations of the notes
+they touched and of the writer's pages. Readers take the key (and so the
+generation) before querying the database, so a response built from data
+that a concurrent write has since replaced is stored under a generation
+nobody looks up any more, instead of being served until NOTE_CACHE_TTL.
+
+Set NOTE_CACHE_URL=redis://... to share one cache between processes. The
+in-process LRU only sees the writes of its own process, so several server
+processes (gunicorn -w, uvicorn --workers) would each serve their own stale
+copies. A process cannot tell whether it has siblings, so the cache is on
+only with NOTE_CACHE_URL, or with NOTE_CACHE_ENABLED=true for deployments
+known to run a single process.
+"""
+import hashlib
+import os
+import uuid
+
+from src import cache
+
+CACHE_URL = os.getenv('NOTE_CACHE_URL')
+ENABLED = os.getenv('NOTE_CACHE_ENABLED', 'true' if CACHE_URL else 'false').lower() == 'true'
+CACHE_SIZE = int(os.getenv('NOTE_CACHE_SIZE', '4096'))
+CACHE_TTL = int(os.getenv('NOTE_CACHE_TTL', '60'))
+
+_backend = cache.from_url(CACHE_URL, maxsize=CACHE_SIZE, ttl=CACHE_TTL, prefix='note-cache:')
+# Kept apart so generation lookups do not count as cache hits and misses.
+# An evicted generation only turns the entries under it into misses.
+_generations = cache.from_url(CACHE_URL, maxsize=CACHE_SIZE * 2, ttl=CACHE_TTL * 2 if CACHE_TTL else None,
+                              prefix='note-cache-generation:')
+
+
+def _pack(body, etag):
+    return etag.encode() + b'\n' + body
+
+
+def _unpack(value):
+    etag, _, body = value.partition(b'\n')
+    return body, etag.decode()
+
+
+def _generation(key):
+    generation = _generations.get(key)
+    if generation is None:
+        # Never reused, so a dropped generation stays dead
+        generation = uuid.uuid4().hex.encode()
+        _generations.set(key, generation)
+    return generation.decode()
+
+
+def note_key(user_id, note_id):
+    """Cache key of GET /notes/<id>; take it before reading the note (None when disabled)."""
+    if not ENABLED:
+        return None
+    return f'note:{user_id}:{note_id}:{_generation(f"note:{user_id}:{note_id}")}'
+
+
+def page_key(user_id, query_string):
+    """Cache key of a GET /notes page; take it before querying (None when disabled)."""
+    if not ENABLED:
+        return None
+    return f'page:{user_id}:{_generation(f"pages:{user_id}")}:{hashlib.sha1(query_string).hexdigest()}'
+
+
+def get(key):
+    """(body, etag) cached under `key`, or None."""
+    if key is None:
+        return None
+    value = _backend.get(key)
+    return _unpack(value) if value is not None else None
+
+
+def put(key, body, etag):
+    if key is not None:
+        _backend.set(key, _pack(body, etag))
+
+
+def invalidate(user_id, note_ids=()):
+    """Forget the given notes of `user_id` and all of their cached list pages. Call after commit."""
+    if not ENABLED:
+        return
+    for note_id in note_ids:
+        _generations.delete(f'note:{user_id}:{note_id}')
+    _generations.delete(f'pages:{user_id}')
+
+
+def clear():
+    _backend.clear()
+    _generations.clear()
+
+
+def stats():
+    return dict(_backend.stats(), enabled=ENABLED)
@@ -0,0 +1,40 @@
+from flask import Blueprint, abort, current_app, jsonify
+from src.models.job import Job, db
+from src import jobs, tenancy
+
+job_bp = Blueprint('job', __name__)
+
+
+def _get_own_job(job_id):
+    # Only the user who queued a job may see it; older jobs carry no owner
+    job = db.get_or_404(Job, job_id)
+    owner = (job.payload or {}).get('user_id')
+    if owner is not None and owner != tenancy.current_user_id():
+        abort(404)
+    return job
+
+
+def _ensure_workers():
+    # Jobs left queued by a previous process resume once someone polls
+    if jobs.WORKER_MODE == 'inprocess':
+        jobs.start_workers(current_app._get_current_object())
+
+
+@job_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of a background job (and its result once finished)"""
+    _ensure_workers()
+    job = _get_own_job(job_id)
+    return jsonify(job.to_dict())
+
+
+@job_bp.route('/jobs/<int:job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Get a job's result: 200 when succeeded, 202 while pending, 500 when failed"""
+    _ensure_workers()
+    job = _get_own_job(job_id)
+    if job.status == 'succeeded':
+        return jsonify(job.result), 200
+    if job.status == 'failed':
+        return jsonify({'error': 'job failed', 'detail': job.error}), 500
+    return jsonify(job.to_dict(include_result=False)), 202
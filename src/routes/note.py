@@ -1,79 +1,869 @@
-from flask import Blueprint, jsonify, request
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, request, stream_with_context
 from src.models.note import Note, db
-from src import llm
+from src import changes, embeddings, jobs, llm, note_cache, search, serialization, tenancy, translation
+from src.serialization import json_response
 
 note_bp = Blueprint('note', __name__)
+note_bp.after_request(serialization.compress_response)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PREVIEW_LENGTH = 200
+MAX_BATCH_ITEMS = 500
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+MAX_PATCH_OPS = 1000
+# Changes newer than this are held back from /notes/changes so a transaction
+# that committed late with an earlier timestamp cannot be skipped by a client
+SYNC_SETTLE_SECONDS = 2
+
+# Columns that may be requested through `?fields=`. `preview` is truncated in
+# SQL so full bodies never leave the database for list views.
+NOTE_FIELDS = {
+    'id': Note.id,
+    'title': Note.title,
+    'content': Note.content,
+    'preview': db.func.substr(Note.content, 1, PREVIEW_LENGTH).label('preview'),
+    'created_at': Note.created_at,
+    'updated_at': Note.updated_at,
+    'version': Note.version,
+}
+FIELD_PRESETS = {
+    'full': ['id', 'title', 'content', 'created_at', 'updated_at', 'version'],
+    'summary': ['id', 'title', 'preview', 'created_at', 'updated_at', 'version'],
+}
+# What Note.to_dict() returns, for statements that RETURNING whole notes
+NOTE_COLUMNS = [NOTE_FIELDS[f] for f in FIELD_PRESETS['full']]
+
+
+def _encode_cursor(updated_at, note_id):
+    raw = json.dumps([updated_at.isoformat(), note_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    updated_at, note_id = json.loads(base64.urlsafe_b64decode(padded))
+    return datetime.fromisoformat(updated_at), int(note_id)
+
+
+def _parse_fields(raw):
+    """Resolve a `fields` parameter (preset name or comma list) to field names."""
+    if not raw:
+        return FIELD_PRESETS['full']
+    if raw in FIELD_PRESETS:
+        return FIELD_PRESETS[raw]
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in NOTE_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _etag(*parts):
+    """Strong validator over the (id, updated_at) pairs that make up a response."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _version_etag(version):
+    """Validator of a single note; If-Match on updates is checked against it."""
+    return f'v{version}'
+
+
+def _expected_version(data):
+    """Version an update is conditional on, from If-Match or `"version"` in the body.
+
+    Returns None for unconditional updates (no precondition, or If-Match: *).
+    """
+    if request.if_match:
+        if request.if_match.star_tag:
+            return None
+        for tag in request.if_match.as_set(include_weak=True):
+            if tag.startswith('v') and tag[1:].isdigit():
+                return int(tag[1:])
+        raise ValueError('If-Match does not name a note version')
+    version = data.get('version')
+    if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+        raise ValueError('version must be an integer')
+    return version
+
+
+def _conditional(response, etag):
+    """Attach `etag` and turn the response into a 304 if the client has it."""
+    response.set_etag(etag)
+    # Always revalidate, so browsers send If-None-Match instead of using stale copies
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def _encoded_response(body, etag):
+    """Conditional response around an already encoded JSON body (see note_cache)."""
+    return _conditional(Response(body, mimetype='application/json'), etag)
+
+
+def wants_stream(data):
+    """Streaming is requested via `?stream=1`, `"stream": true` or Accept: text/event-stream."""
+    return (
+        request.args.get('stream') in ('1', 'true')
+        or data.get('stream') is True
+        or request.accept_mimetypes.best == 'text/event-stream'
+    )
+
+
+def _enqueue_response(kind, payload):
+    """Queue an LLM job and answer 202 with where to poll for its result."""
+    job = jobs.enqueue(kind, payload)
+    response = json_response({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'result_url': f'/api/jobs/{job.id}/result',
+    })
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response
+
+
+def _sse_response(chunks, done):
+    """Relay (delta, ...) tuples from `chunks` as Server-Sent Events.
+
+    Each delta is sent as a `data: {"delta": ...}` event; `done(text, extra)`
+    builds the payload of the final `done` event. Upstream failures after the
+    stream has started are reported as an `error` event.
+    """
+    def generate():
+        parts = []
+        extra = None
+        try:
+            for delta, *extra in chunks:
+                parts.append(delta)
+                yield serialization.sse_event({'delta': delta})
+            yield serialization.sse_event(done(''.join(parts).strip(), extra), event='done')
+        except Exception as e:
+            db.session.rollback()
+            yield serialization.sse_event({'error': 'generation failed', 'detail': str(e)}, event='error')
+        finally:
+            # Runs on client disconnect too, closing the upstream LLM stream
+            chunks.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def resolve_llm_input(kind, data):
+    """Common front half of /notes/translate and /notes/complete.
+
+    Returns (content, note_id, None) when the request should be answered by
+    calling the LLM, or (None, None, response) when it is already answered:
+    a queued `async` job, a missing note or missing content. Shared with the
+    async routes of api/asgi.py.
+    """
+    content = data.get('content')
+    note_id = data.get('note_id')
+    user_id = tenancy.current_user_id()
+
+    if data.get('async') is True:
+        if not content and not note_id:
+            return None, None, (json_response({'error': 'content or note_id required'}), 400)
+        return None, None, _enqueue_response(kind, {'content': content, 'note_id': note_id, 'user_id': user_id})
+
+    if not content and note_id:
+        note = Note.live(user_id).filter_by(id=note_id).first()
+        if not note:
+            return None, None, (json_response({'error': 'note not found'}), 404)
+        content = note.content
+
+    if not content:
+        return None, None, (json_response({'error': 'content or note_id required'}), 400)
+    return content, note_id, None
+
+
+def _serialize_row(row, fields):
+    return {field: getattr(row, field) for field in fields}
+
 
 @note_bp.route('/notes', methods=['GET'])
 def get_notes():
-    """Get all notes, ordered by most recently updated"""
-    notes = Note.query.order_by(Note.updated_at.desc()).all()
-    return jsonify([note.to_dict() for note in notes])
+    """List notes, most recently updated first, one keyset page at a time.
+
+    Query parameters:
+      limit  -- page size (default 50, max 200)
+      cursor -- `next_cursor` from the previous page
+      fields -- `full`, `summary` or a comma list of note fields
+
+    Returns { "notes": [...], "next_cursor": "..." | null }; the first page
+    also carries `sync_token` for /notes/changes. Honours If-None-Match.
+    """
+    user_id = tenancy.current_user_id()
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        fields = _parse_fields(request.args.get('fields'))
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except (TypeError, ValueError) as e:
+        return json_response({'error': f'invalid pagination parameters: {e}'}), 400
+
+    # Taken before the query: a write committing meanwhile retires this key
+    cache_key = note_cache.page_key(user_id, request.query_string)
+    cached = note_cache.get(cache_key)
+    if cached:
+        return _encoded_response(*cached)
+
+    # The keyset columns are always selected so the next cursor can be built
+    columns = [NOTE_FIELDS[f] for f in fields]
+    for key in ('updated_at', 'id'):
+        if key not in fields:
+            columns.append(NOTE_FIELDS[key])
+
+    query = db.session.query(*columns).filter(Note.user_id == user_id, Note.deleted_at.is_(None))
+    if after:
+        query = query.filter(db.tuple_(Note.updated_at, Note.id) < db.tuple_(*after))
+    rows = query.order_by(Note.updated_at.desc(), Note.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].updated_at, rows[-1].id)
+
+    payload = {
+        'notes': [_serialize_row(row, fields) for row in rows],
+        'next_cursor': next_cursor,
+    }
+    if not cursor:
+        # Starting point for /notes/changes, covering deletions too. Held back
+        # by the settle window; changes re-sent because of it are idempotent.
+        settled = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        latest = db.session.query(Note.updated_at, Note.id).filter(
+            Note.user_id == user_id, Note.updated_at <= settled
+        ).order_by(
+            Note.updated_at.desc(), Note.id.desc()
+        ).first()
+        payload['sync_token'] = _encode_cursor(*latest) if latest else None
+
+    etag = _etag(request.query_string, payload['sync_token'] if not cursor else None,
+                 *((row.id, row.updated_at) for row in rows))
+    body = serialization.dumps(payload)
+    note_cache.put(cache_key, body, etag)
+    return _encoded_response(body, etag)
+
+@note_bp.route('/notes/changes', methods=['GET'])
+def get_note_changes():
+    """Delta sync: notes created, updated or deleted since a sync token.
+
+    Query parameters:
+      since  -- `sync_token` from GET /notes or `next_token` from this endpoint;
+                omit for a full sync of live notes
+      limit  -- page size (default 50, max 200)
+      fields -- as for GET /notes
+
+    Returns { "changes": [...], "next_token": "...", "has_more": bool }.
+    Deleted notes appear as { "id", "deleted": true, "updated_at" }.
+    """
+    user_id = tenancy.current_user_id()
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        fields = _parse_fields(request.args.get('fields'))
+        since = request.args.get('since')
+        after = _decode_cursor(since) if since else None
+    except (TypeError, ValueError) as e:
+        return json_response({'error': f'invalid sync parameters: {e}'}), 400
+
+    columns = [NOTE_FIELDS[f] for f in fields] + [Note.deleted_at.label('deleted_at')]
+    for key in ('updated_at', 'id'):
+        if key not in fields:
+            columns.append(NOTE_FIELDS[key])
+
+    settled = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    query = db.session.query(*columns).filter(Note.user_id == user_id, Note.updated_at <= settled)
+    if after:
+        query = query.filter(db.tuple_(Note.updated_at, Note.id) > db.tuple_(*after))
+    else:
+        query = query.filter(Note.deleted_at.is_(None))
+    rows = query.order_by(Note.updated_at, Note.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = []
+    for row in rows:
+        if row.deleted_at:
+            changes.append({'id': row.id, 'deleted': True, 'updated_at': row.updated_at})
+        else:
+            changes.append(dict(_serialize_row(row, fields), deleted=False))
+    next_token = _encode_cursor(rows[-1].updated_at, rows[-1].id) if rows else since
+
+    return json_response({'changes': changes, 'next_token': next_token, 'has_more': has_more})
+
 
 @note_bp.route('/notes', methods=['POST'])
 def create_note():
     """Create a new note"""
+    user_id = tenancy.current_user_id()
     try:
         data = request.json
         if not data or 'title' not in data or 'content' not in data:
-            return jsonify({'error': 'Title and content are required'}), 400
+            return json_response({'error': 'Title and content are required'}), 400
         
-        note = Note(title=data['title'], content=data['content'])
+        note = Note(title=data['title'], content=data['content'], user_id=user_id)
         db.session.add(note)
+        db.session.flush()
+        recorded = changes.record([note.id])
         db.session.commit()
-        return jsonify(note.to_dict()), 201
+        note_cache.invalidate(user_id)
+        body = note.to_dict()
+        if recorded:
+            jobs.notify()
+        return json_response(body), 201
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @note_bp.route('/notes/<int:note_id>', methods=['GET'])
 def get_note(note_id):
-    """Get a specific note by ID"""
-    note = Note.query.get_or_404(note_id)
-    return jsonify(note.to_dict())
+    """Get a specific note by ID; honours If-None-Match. Read through note_cache."""
+    user_id = tenancy.current_user_id()
+    cache_key = note_cache.note_key(user_id, note_id)
+    cached = note_cache.get(cache_key)
+    if cached:
+        return _encoded_response(*cached)
+    note = Note.live(user_id).filter_by(id=note_id).first_or_404()
+    body, etag = serialization.dumps(note.to_dict()), _version_etag(note.version)
+    note_cache.put(cache_key, body, etag)
+    return _encoded_response(body, etag)
 
 @note_bp.route('/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
-    """Update a specific note"""
+    """Update a specific note with a single UPDATE ... RETURNING statement.
+
+    If the client names the version it edited (`If-Match` with the note's
+    ETag, or `"version"` in the body) and the note has been written since,
+    nothing is changed and 409 is returned with the current note.
+    """
+    data = request.get_json(silent=True)
+    values = {k: data[k] for k in ('title', 'content') if k in data} if isinstance(data, dict) else {}
+    if not values:
+        return json_response({'error': 'No data provided'}), 400
+    if any(not isinstance(v, str) for v in values.values()):
+        return json_response({'error': 'title and content must be strings'}), 400
     try:
-        note = Note.query.get_or_404(note_id)
-        data = request.json
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        note.title = data.get('title', note.title)
-        note.content = data.get('content', note.content)
+        expected = _expected_version(data)
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+
+    user_id = tenancy.current_user_id()
+    statement = db.update(Note).where(Note.id == note_id, Note.user_id == user_id, Note.deleted_at.is_(None))
+    if expected is not None:
+        statement = statement.where(Note.version == expected)
+    statement = statement.values(
+        **values, version=Note.version + 1, updated_at=datetime.utcnow()
+    ).returning(*NOTE_COLUMNS).execution_options(synchronize_session=False)
+
+    recorded = False
+    try:
+        row = db.session.execute(statement).first()
+        if row is not None:
+            if 'content' in values:
+                translation.invalidate_note(note_id)
+            recorded = changes.record([note_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return json_response({'error': str(e)}), 500
+
+    if row is None:
+        # Only the failure path reads: was the note missing or modified?
+        return _version_conflict(Note.live(user_id).filter_by(id=note_id).first_or_404())
+
+    note_cache.invalidate(user_id, [note_id])
+    if recorded:
+        jobs.notify()
+    response = json_response(row._asdict())
+    response.set_etag(_version_etag(row.version))
+    return response
+
+
+def _version_conflict(current):
+    """409 carrying the note as it is now, so the client can rebase or retry."""
+    response = json_response({'error': 'version conflict', 'note': current.to_dict()})
+    response.status_code = 409
+    response.set_etag(_version_etag(current.version))
+    return response
+
+
+def _parse_patch_ops(ops):
+    """Validate [position, delete_count, insert_text] ops.
+
+    Returns (ops without no-ops, length the base content must at least have).
+    """
+    if not isinstance(ops, list) or len(ops) > MAX_PATCH_OPS:
+        raise ValueError(f'ops must be a list of at most {MAX_PATCH_OPS} operations')
+    parsed = []
+    end = 0
+    for op in ops:
+        if not (isinstance(op, list) and len(op) == 3):
+            raise ValueError('each op must be [position, delete_count, insert_text]')
+        position, delete, insert = op
+        if not (type(position) is int and type(delete) is int and isinstance(insert, str)):
+            raise ValueError('each op must be [position, delete_count, insert_text]')
+        if position < end or delete < 0:
+            raise ValueError('ops must be sorted by position and must not overlap')
+        if delete or insert:
+            parsed.append((position, delete, insert))
+        end = position + delete
+    return parsed, end
+
+
+def _splice(column, ops):
+    """SQL expression applying `ops` to `column`: kept substrings || inserted text."""
+    pieces = []
+    consumed = 0
+    for position, delete, insert in ops:
+        if position > consumed:
+            pieces.append(db.func.substr(column, consumed + 1, position - consumed, type_=db.Text))
+        if insert:
+            pieces.append(db.literal(insert, db.Text))
+        consumed = position + delete
+    pieces.append(db.func.substr(column, consumed + 1, type_=db.Text))
+    expression = pieces[0]
+    for piece in pieces[1:]:
+        expression = expression + piece
+    return expression
+
+
+@note_bp.route('/notes/<int:note_id>', methods=['PATCH'])
+def patch_note(note_id):
+    """Apply a text diff to a note, so only the edit crosses the wire.
+
+    Request JSON:
+      { "version": 3, "ops": [[position, delete_count, "insert"], ...], "title": "..." }
+
+    Ops are sorted, non-overlapping splices of the content at `version`
+    (also accepted as If-Match); positions count Unicode code points. The
+    splice is evaluated inside the UPDATE statement, so the body is never
+    read back into the application. Returns the note without `content`,
+    plus `content_length` for the client to check its copy against. A
+    patch without ops or title writes nothing and returns the note as is.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return json_response({'error': 'No data provided'}), 400
+    try:
+        expected = _expected_version(data)
+        ops, base_length = _parse_patch_ops(data.get('ops', []))
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    if expected is None:
+        return json_response({'error': 'version is required: ops apply to a specific version'}), 428
+    if 'title' in data and not isinstance(data['title'], str):
+        return json_response({'error': 'title must be a string'}), 400
+
+    user_id = tenancy.current_user_id()
+    columns = (
+        Note.id, Note.title, Note.created_at, Note.updated_at, Note.version,
+        db.func.length(Note.content).label('content_length'),
+    )
+    if not ops and 'title' not in data:
+        # Nothing to change: no version bump, change record or invalidation
+        row = db.session.query(*columns).filter(
+            Note.id == note_id, Note.user_id == user_id, Note.deleted_at.is_(None)
+        ).first_or_404()
+        if row.version != expected:
+            return _version_conflict(Note.live(user_id).filter_by(id=note_id).first_or_404())
+        response = json_response(row._asdict())
+        response.set_etag(_version_etag(row.version))
+        return response
+
+    values = {'version': Note.version + 1, 'updated_at': datetime.utcnow()}
+    if ops:
+        values['content'] = _splice(Note.content, ops)
+    if 'title' in data:
+        values['title'] = data['title']
+
+    statement = db.update(Note).where(
+        Note.id == note_id, Note.user_id == user_id, Note.deleted_at.is_(None), Note.version == expected
+    )
+    if base_length:
+        statement = statement.where(db.func.length(Note.content) >= base_length)
+    statement = statement.values(**values).returning(*columns).execution_options(synchronize_session=False)
+
+    recorded = False
+    try:
+        row = db.session.execute(statement).first()
+        if row is not None and ops:
+            translation.invalidate_note(note_id)
+        if row is not None:
+            recorded = changes.record([note_id])
         db.session.commit()
-        return jsonify(note.to_dict())
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+    if row is None:
+        current = Note.live(user_id).filter_by(id=note_id).first_or_404()
+        if current.version != expected:
+            return _version_conflict(current)
+        return json_response({'error': 'ops reach past the end of the content'}), 422
+
+    note_cache.invalidate(user_id, [note_id])
+    if recorded:
+        jobs.notify()
+    response = json_response(row._asdict())
+    response.set_etag(_version_etag(row.version))
+    return response
 
 @note_bp.route('/notes/<int:note_id>', methods=['DELETE'])
 def delete_note(note_id):
-    """Delete a specific note"""
+    """Delete a specific note, leaving a tombstone for /notes/changes"""
+    user_id = tenancy.current_user_id()
+    note = Note.live(user_id).filter_by(id=note_id).first_or_404()
     try:
-        note = Note.query.get_or_404(note_id)
-        db.session.delete(note)
+        translation.invalidate_note(note.id)
+        note.mark_deleted()
+        recorded = changes.record([note.id])
         db.session.commit()
+        note_cache.invalidate(user_id, [note_id])
+        if recorded:
+            jobs.notify()
         return '', 204
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+def _parse_batch_operation(op):
+    """Check one batch operation; returns an error message or None."""
+    if not isinstance(op, dict) or op.get('op') not in ('create', 'update', 'delete'):
+        return 'op must be one of create, update, delete'
+    if op['op'] in ('update', 'delete'):
+        if op.get('id') is None:
+            return 'id is required'
+        # Not isinstance: true would be taken for note 1
+        if type(op['id']) is not int:
+            return 'id must be an integer'
+    if op['op'] == 'create' and not (isinstance(op.get('title'), str) and isinstance(op.get('content'), str)):
+        return 'Title and content are required'
+    if op['op'] == 'update':
+        if not ('title' in op or 'content' in op):
+            return 'No data provided'
+        if any(k in op and not isinstance(op[k], str) for k in ('title', 'content')):
+            return 'title and content must be strings'
+        if op.get('version') is not None and (not isinstance(op['version'], int) or isinstance(op['version'], bool)):
+            return 'version must be an integer'
+    return None
+
+
+def _batch_update(user_id, updates, now):
+    """One UPDATE ... RETURNING applying every batch update, keyed by id with CASE.
+
+    `updates` are op dicts with unique ids. A row is only returned if its
+    update applied, so each op's outcome is read off the result rather than
+    inferred afterwards; ops without `version` skip the concurrency check.
+    """
+    versioned = [op for op in updates if op.get('version') is not None]
+    unversioned = [op['id'] for op in updates if op.get('version') is None]
+    values = {'version': Note.version + 1, 'updated_at': now}
+    for field, column in (('title', Note.title), ('content', Note.content)):
+        new = {op['id']: op[field] for op in updates if field in op}
+        if new:
+            values[field] = db.case(new, value=Note.id, else_=column)
+    matches = [(Note.id == op['id']) & (Note.version == op['version']) for op in versioned]
+    if unversioned:
+        matches.append(Note.id.in_(unversioned))
+    return db.update(Note).where(
+        Note.user_id == user_id, Note.deleted_at.is_(None), db.or_(*matches)
+    ).values(**values).returning(*NOTE_COLUMNS).execution_options(synchronize_session=False)
+
+
+@note_bp.route('/notes/batch', methods=['POST'])
+def batch_notes():
+    """Apply many create/update/delete operations in one transaction.
+
+    Request JSON:
+      { "operations": [
+          { "op": "create", "title": "...", "content": "..." },
+          { "op": "update", "id": 1, "title": "...", "content": "...", "version": 3 },
+          { "op": "delete", "id": 2 }
+        ],
+        "atomic": false }
+
+    Each kind of operation is executed as one bulk statement, so the number
+    of database round trips does not grow with the number of operations.
+    Invalid operations, unknown ids and ids used by more than one operation
+    are reported per operation, as are updates whose `version` is no longer
+    current (409), whether caught before or by their statement; with
+    `"atomic": true` any such failure rolls back the whole batch (409).
+
+    Returns { "results": [{ "op", "status", "note" | "id" | "error" }, ...] }
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return json_response({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > MAX_BATCH_ITEMS:
+        return json_response({'error': f'at most {MAX_BATCH_ITEMS} operations per batch'}), 400
+
+    user_id = tenancy.current_user_id()
+    results = [None] * len(operations)
+    for i, op in enumerate(operations):
+        error = _parse_batch_operation(op)
+        if error:
+            results[i] = {'op': op.get('op') if isinstance(op, dict) else None, 'status': 400, 'error': error}
+
+    # Several operations on one id would depend on their order and the
+    # later ones would match no row: only the first is applied
+    seen = set()
+    for i, op in enumerate(operations):
+        if results[i] is None and op['op'] != 'create':
+            if op['id'] in seen:
+                results[i] = {'op': op['op'], 'status': 400, 'id': op['id'],
+                              'error': 'id appears in more than one operation'}
+            seen.add(op['id'])
+
+    referenced = {op['id'] for i, op in enumerate(operations) if results[i] is None and op['op'] != 'create'}
+    existing = dict(
+        db.session.query(Note.id, Note.version).filter(
+            Note.id.in_(referenced), Note.user_id == user_id, Note.deleted_at.is_(None)
+        ).all()
+    ) if referenced else {}
+
+    creates, updates, deletes = [], [], []
+    now = datetime.utcnow()
+    for i, op in enumerate(operations):
+        if results[i] is not None:
+            continue
+        if op['op'] != 'create' and op['id'] not in existing:
+            results[i] = {'op': op['op'], 'status': 404, 'id': op['id'], 'error': 'note not found'}
+        elif op['op'] == 'create':
+            creates.append((i, {'title': op['title'], 'content': op['content'], 'user_id': user_id,
+                                'created_at': now, 'updated_at': now}))
+        elif op['op'] == 'update':
+            if op.get('version') is not None and op['version'] != existing[op['id']]:
+                results[i] = {'op': 'update', 'status': 409, 'id': op['id'], 'error': 'version conflict',
+                              'version': existing[op['id']]}
+                continue
+            updates.append((i, op))
+        else:
+            deletes.append((i, op['id']))
+
+    def rejected():
+        return any(r and r['status'] >= 400 for r in results)
+
+    if data.get('atomic') and rejected():
+        return json_response({'error': 'batch rejected', 'results': [r or {'status': 424} for r in results]}), 409
+
+    try:
+        created_ids = []
+        if creates:
+            created_ids = db.session.execute(
+                db.insert(Note).returning(Note.id, sort_by_parameter_order=True),
+                [row for _, row in creates],
+            ).scalars().all()
+        updated = {}
+        if updates:
+            updated = {row.id: row._asdict() for row in db.session.execute(
+                _batch_update(user_id, [op for _, op in updates], now)
+            )}
+            translation.invalidate_notes({op['id'] for _, op in updates if 'content' in op and op['id'] in updated})
+        deleted_ids = set()
+        if deletes:
+            deleted_ids = set(db.session.execute(
+                db.update(Note)
+                .where(Note.id.in_([note_id for _, note_id in deletes]), Note.user_id == user_id,
+                       Note.deleted_at.is_(None))
+                .values(title='', content='', deleted_at=now, updated_at=now, version=Note.version + 1)
+                .returning(Note.id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+            translation.invalidate_notes(deleted_ids)
+
+        # Ops that matched no row were written or deleted by someone else
+        # between the check above and their statement
+        missed = [op['id'] for _, op in updates if op['id'] not in updated]
+        current = dict(
+            db.session.query(Note.id, Note.version).filter(
+                Note.id.in_(missed), Note.user_id == user_id, Note.deleted_at.is_(None)
+            ).all()
+        ) if missed else {}
+        for i, op in updates:
+            if op['id'] in updated:
+                results[i] = {'op': 'update', 'status': 200, 'note': updated[op['id']]}
+            elif op['id'] in current:
+                results[i] = {'op': 'update', 'status': 409, 'id': op['id'], 'error': 'version conflict',
+                              'version': current[op['id']]}
+            else:
+                results[i] = {'op': 'update', 'status': 404, 'id': op['id'], 'error': 'note not found'}
+        for i, note_id in deletes:
+            results[i] = ({'op': 'delete', 'status': 204, 'id': note_id} if note_id in deleted_ids
+                          else {'op': 'delete', 'status': 404, 'id': note_id, 'error': 'note not found'})
+        if data.get('atomic') and rejected():
+            db.session.rollback()
+            failed = [r if r and r['status'] >= 400 else {'status': 424} for r in results]
+            return json_response({'error': 'batch rejected', 'results': failed}), 409
+
+        # Serialised before commit, which would expire the loaded rows
+        created = {note.id: note.to_dict() for note in Note.query.filter(Note.id.in_(created_ids))} if created_ids else {}
+        touched = set(created_ids) | set(updated)
+        recorded = changes.record(touched | deleted_ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return json_response({'error': str(e)}), 500
+    note_cache.invalidate(user_id, touched | deleted_ids)
+    if recorded:
+        jobs.notify()
+
+    for (i, _), note_id in zip(creates, created_ids):
+        results[i] = {'op': 'create', 'status': 201, 'note': created[note_id]}
+    return json_response({'results': results})
+
 
 @note_bp.route('/notes/search', methods=['GET'])
 def search_notes():
-    """Search notes by title or content"""
+    """Full-text search notes by title or content.
+
+    Query parameters:
+      q     -- search terms; each term matches as a word prefix
+      limit -- maximum number of results (default 20, max 100)
+
+    Returns ranked results with a highlighted `snippet` in place of `content`.
+    """
     query = request.args.get('q', '')
     if not query:
-        return jsonify([])
-    
-    notes = Note.query.filter(
-        (Note.title.contains(query)) | (Note.content.contains(query))
-    ).order_by(Note.updated_at.desc()).all()
-    
-    return jsonify([note.to_dict() for note in notes])
+        return json_response([])
+
+    try:
+        limit = int(request.args.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        return json_response({'error': 'limit must be an integer'}), 400
+
+    results = search.search_notes(query, tenancy.current_user_id(), limit=limit)
+    return json_response(results)
+
+
+@note_bp.route('/notes/search/semantic', methods=['GET'])
+def semantic_search_notes():
+    """Search notes by meaning rather than by words (see src/embeddings.py).
+
+    Query parameters:
+      q     -- free text
+      limit -- maximum number of results (default 20, max 100)
+
+    Returns results shaped like /notes/search, `rank` being the cosine
+    similarity and `snippet` the start of the content. 503 when no
+    embedder is configured (EMBEDDING_BACKEND).
+    """
+    if not embeddings.enabled():
+        return json_response({'error': 'semantic search is not enabled'}), 503
+    query = request.args.get('q', '').strip()
+    if not query:
+        return json_response([])
+
+    try:
+        limit = min(max(int(request.args.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+    except ValueError:
+        return json_response({'error': 'limit must be an integer'}), 400
+
+    user_id = tenancy.current_user_id()
+    try:
+        results = embeddings.search(query, user_id, limit)
+    except Exception as e:
+        db.session.rollback()
+        return json_response({'error': 'semantic search failed', 'detail': str(e)}), 500
+    return json_response(results)
+
+
+def _import_row(line, user_id):
+    """Validate one NDJSON line and turn it into an INSERT parameter dict."""
+    item = json.loads(line)
+    if not isinstance(item, dict) or not isinstance(item.get('title'), str) or not isinstance(item.get('content'), str):
+        raise ValueError('title and content are required strings')
+    now = datetime.utcnow()
+    created_at = datetime.fromisoformat(item['created_at']) if item.get('created_at') else now
+    # An imported note is a change as of now: an older client-sent updated_at
+    # would sort before sync tokens already handed out and /notes/changes
+    # would never report the note
+    return {'title': item['title'], 'content': item['content'], 'user_id': user_id,
+            'created_at': created_at, 'updated_at': now}
+
+
+@note_bp.route('/notes/import', methods=['POST'])
+def import_notes():
+    """Bulk-create notes from an NDJSON request body (one note object per line).
+
+    The body is read as a stream and inserted in executemany batches of
+    1000 rows, each committed on its own, so memory stays constant.
+    Invalid lines are skipped and reported. Ids are always newly assigned;
+    `created_at` is kept from the line, `updated_at` is the import time.
+
+    Returns { "imported": n, "failed": n, "errors": [{"line": n, "error": "..."}] }
+    """
+    user_id = tenancy.current_user_id()
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    recorded = False
+
+    def flush():
+        nonlocal imported, recorded
+        if changes.enabled():
+            note_ids = db.session.execute(db.insert(Note).returning(Note.id), batch).scalars().all()
+            recorded = changes.record(note_ids) or recorded
+        else:
+            db.session.execute(db.insert(Note), batch)
+        db.session.commit()
+        note_cache.invalidate(user_id)
+        imported += len(batch)
+        batch.clear()
+
+    try:
+        for line_number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                batch.append(_import_row(line, user_id))
+            except (TypeError, ValueError) as e:
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_number, 'error': str(e)})
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    except Exception as e:
+        db.session.rollback()
+        return json_response({'error': str(e), 'imported': imported}), 500
+
+    if recorded:
+        jobs.notify()
+    return json_response({'imported': imported, 'failed': failed, 'errors': errors})
+
+
+@note_bp.route('/notes/export', methods=['GET'])
+def export_notes():
+    """Stream every note of the current user as NDJSON in id order.
+
+    Rows are fetched through a server-side cursor in batches of 1000
+    (yield_per) and encoded a batch at a time, so the table is never
+    materialised in memory.
+    """
+    columns = [Note.id, Note.title, Note.content, Note.created_at, Note.updated_at]
+    statement = db.select(*columns).where(
+        Note.user_id == tenancy.current_user_id(), Note.deleted_at.is_(None)
+    ).order_by(Note.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    rows = (row._asdict() for row in db.session.execute(statement))
+    response = Response(stream_with_context(serialization.iter_ndjson(rows, EXPORT_BATCH_SIZE)), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename=notes.ndjson'
+    return response
 
 
 @note_bp.route('/notes/translate', methods=['POST'])
@@ -83,51 +873,131 @@ def translate_note():
     Request JSON examples:
       { "content": "some english text" }
       { "note_id": 123 }
+
+    With `"stream": true` (or Accept: text/event-stream) the translation is
+    sent as Server-Sent Events: `{"delta": ...}` pieces, then a `done` event.
+    With `"async": true` a background job is queued and 202 is returned with
+    the /api/jobs URLs to poll.
     """
     data = request.get_json(silent=True) or {}
-    content = data.get('content')
-    note_id = data.get('note_id')
+    content, note_id, response = resolve_llm_input('translate', data)
+    if response is not None:
+        return response
 
-    if not content and note_id:
-        note = Note.query.get(note_id)
-        if not note:
-            return jsonify({'error': 'note not found'}), 404
-        content = note.content
+    if wants_stream(data):
+        chunks = translation.translate_stream(
+            content, source_lang='English', target_lang='Chinese', note_id=note_id
+        )
+        return _sse_response(chunks, lambda text, extra: {'translation': text, 'cached': bool(extra and extra[0])})
 
-    if not content:
-        return jsonify({'error': 'content or note_id required'}), 400
+    try:
+        translated, cached = translation.translate(
+            content, source_lang='English', target_lang='Chinese', note_id=note_id
+        )
+        return json_response({'translation': translated, 'cached': cached}), 200
+    except Exception as e:
+        db.session.rollback()
+        return json_response({'error': 'translation failed', 'detail': str(e)}), 500
+
+
+@note_bp.route('/notes/translate/batch', methods=['POST'])
+def translate_notes_batch():
+    """Translate many notes in one request.
+
+    Request JSON: { "note_ids": [1, 2, ...] } and/or { "contents": ["...", ...] }
+
+    Returns { "results": [...] } in request order, note ids first; each item
+    has `note_id` or `index` plus `translation`/`cached` or `error` (also
+    for ids that are not integers and contents that are not strings). With
+    `?stream=1` (or `"stream": true`) items are sent as NDJSON lines in
+    completion order instead.
+    """
+    data = request.get_json(silent=True) or {}
+    note_ids = data.get('note_ids') or []
+    contents = data.get('contents') or []
+    if not isinstance(note_ids, list) or not isinstance(contents, list):
+        return json_response({'error': 'note_ids and contents must be lists'}), 400
+    if not note_ids and not contents:
+        return json_response({'error': 'note_ids or contents required'}), 400
+    if len(note_ids) + len(contents) > MAX_BATCH_ITEMS:
+        return json_response({'error': f'at most {MAX_BATCH_ITEMS} items per batch'}), 400
+
+    # bool is an int subclass; anything else would reach the IN query (or the dict lookup) as is
+    valid_ids = {note_id for note_id in note_ids if type(note_id) is int}
+    # One IN query for every referenced note
+    found = dict(
+        db.session.query(Note.id, Note.content).filter(
+            Note.id.in_(valid_ids), Note.user_id == tenancy.current_user_id(), Note.deleted_at.is_(None)
+        ).all()
+    ) if valid_ids else {}
+
+    labels = []
+    items = []
+    results = [None] * (len(note_ids) + len(contents))
+    for position, note_id in enumerate(note_ids):
+        if type(note_id) is not int:
+            results[position] = {'note_id': note_id, 'error': 'note id must be an integer'}
+        elif note_id not in found:
+            results[position] = {'note_id': note_id, 'error': 'note not found'}
+        else:
+            labels.append((position, {'note_id': note_id}))
+            items.append((found[note_id], note_id))
+    for index, content in enumerate(contents):
+        position = len(note_ids) + index
+        if not isinstance(content, str) or not content:
+            results[position] = {'index': index, 'error': 'content must be a non-empty string'}
+        else:
+            labels.append((position, {'index': index}))
+            items.append((content, None))
+
+    translated = translation.translate_many(items, source_lang='English', target_lang='Chinese')
+
+    if request.args.get('stream') in ('1', 'true') or data.get('stream') is True:
+        def generate():
+            yield from (result for result in results if result is not None)
+            for item_index, result in translated:
+                yield dict(labels[item_index][1], **result)
+
+        # One line per chunk, so every result is flushed as soon as it is ready
+        lines = serialization.iter_ndjson(generate(), batch_size=1)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
 
     try:
-        translation = llm.translate_text(content, source_lang='English', target_lang='Chinese')
-        return jsonify({'translation': translation}), 200
+        for item_index, result in translated:
+            position, label = labels[item_index]
+            results[position] = dict(label, **result)
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'translation failed', 'detail': str(e)}), 500
+        return json_response({'error': 'translation failed', 'detail': str(e)}), 500
+    return json_response({'results': results})
+
+
+@note_bp.route('/notes/translate/stats', methods=['GET'])
+def translation_cache_stats():
+    """Hit/miss counters of the translation cache tiers"""
+    return json_response(translation.stats())
 
 
 @note_bp.route('/notes/complete', methods=['POST'])
 def complete_note():
     """Auto-complete partial note content. Accepts JSON with either `content` or `note_id`.
 
-    Returns { "completion": "..." }
+    Returns { "completion": "..." }, or Server-Sent Events / a queued job when
+    `stream` / `async` is requested as for /notes/translate.
     """
     data = request.get_json(silent=True) or {}
-    content = data.get('content')
-    note_id = data.get('note_id')
-
-    if not content and note_id:
-        note = Note.query.get(note_id)
-        if not note:
-            return jsonify({'error': 'note not found'}), 404
-        content = note.content
+    content, note_id, response = resolve_llm_input('complete', data)
+    if response is not None:
+        return response
 
-    if not content:
-        return jsonify({'error': 'content or note_id required'}), 400
+    if wants_stream(data):
+        chunks = ((delta,) for delta in llm.complete_text_stream(content))
+        return _sse_response(chunks, lambda text, extra: {'completion': text})
 
     try:
         completion = llm.complete_text(content)
-        return jsonify({'completion': completion}), 200
+        return json_response({'completion': completion}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'completion failed', 'detail': str(e)}), 500
+        return json_response({'error': 'completion failed', 'detail': str(e)}), 500
 
@@ -1,12 +1,15 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, request
 from src.models.user import User, db
+from src import serialization, tenancy
+from src.serialization import json_response
 
 user_bp = Blueprint('user', __name__)
+user_bp.after_request(serialization.compress_response)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    users = User.query.order_by(User.id).yield_per(serialization.STREAM_BATCH_SIZE)
+    return serialization.stream_json_array(user.to_dict() for user in users)
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -15,12 +18,12 @@ def create_user():
     user = User(username=data['username'], email=data['email'])
     db.session.add(user)
     db.session.commit()
-    return jsonify(user.to_dict()), 201
+    return json_response(user.to_dict()), 201
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    return json_response(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
@@ -29,11 +32,12 @@ def update_user(user_id):
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
     db.session.commit()
-    return jsonify(user.to_dict())
+    return json_response(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    tenancy.forget_user(user_id)
     return '', 204
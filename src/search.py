@@ -0,0 +1,120 @@
+import re
+
+from sqlalchemy import inspect, text
+
+from src.models.note import Note, db
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+SNIPPET_START = '<mark>'
+SNIPPET_STOP = '</mark>'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Whether the dialect-specific index exists, cached per database URL so the
+# catalog is inspected once per process rather than on every keystroke.
+_fts_available = {}
+
+_POSTGRES_SEARCH = text(f"""
+    SELECT n.id, n.title, n.created_at, n.updated_at, ranked.rank,
+           ts_headline('simple', n.content, ranked.query,
+                       'StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=24, MinWords=8, MaxFragments=2')
+               AS snippet
+    FROM (
+        SELECT id, query, ts_rank_cd(search_vector, query) AS rank
+        FROM note, to_tsquery('simple', :query) AS query
+        WHERE user_id = :user_id AND search_vector @@ query AND deleted_at IS NULL
+        ORDER BY rank DESC, updated_at DESC
+        LIMIT :limit
+    ) AS ranked
+    JOIN note AS n ON n.id = ranked.id
+    ORDER BY ranked.rank DESC, n.updated_at DESC
+""").columns(created_at=db.DateTime, updated_at=db.DateTime)
+
+# bm25() is lower-is-better; the title column is weighted above the body
+_SQLITE_SEARCH = text(f"""
+    SELECT note.id, note.title, note.created_at, note.updated_at,
+           -bm25(note_fts, 10.0, 1.0) AS rank,
+           snippet(note_fts, 1, '{SNIPPET_START}', '{SNIPPET_STOP}', '…', 16) AS snippet
+    FROM note_fts
+    JOIN note ON note.id = note_fts.rowid
+    WHERE note_fts MATCH :query AND note.user_id = :user_id AND note.deleted_at IS NULL
+    ORDER BY bm25(note_fts, 10.0, 1.0), note.updated_at DESC
+    LIMIT :limit
+""").columns(created_at=db.DateTime, updated_at=db.DateTime)
+
+
+def tokenize(query):
+    """Split free text into search terms, dropping all query-syntax characters."""
+    return _TOKEN_RE.findall(query.lower())
+
+
+def _has_fts(engine):
+    key = str(engine.url)
+    if key not in _fts_available:
+        inspector = inspect(engine)
+        if engine.dialect.name == 'postgresql':
+            columns = {c['name'] for c in inspector.get_columns('note')}
+            _fts_available[key] = 'search_vector' in columns
+        elif engine.dialect.name == 'sqlite':
+            _fts_available[key] = inspector.has_table('note_fts')
+        else:
+            _fts_available[key] = False
+    return _fts_available[key]
+
+
+def _like_snippet(content, terms, width=80):
+    """Build a highlighted excerpt around the first matching term."""
+    lowered = content.lower()
+    positions = [lowered.find(t) for t in terms if lowered.find(t) >= 0]
+    if not positions:
+        return content[:width * 2]
+    start = max(min(positions) - width, 0)
+    excerpt = content[start:start + width * 2]
+    for term in terms:
+        excerpt = re.sub(f'({re.escape(term)})', rf'{SNIPPET_START}\1{SNIPPET_STOP}', excerpt, flags=re.IGNORECASE)
+    return ('…' if start else '') + excerpt
+
+
+def _search_like(terms, limit, user_id):
+    query = Note.live(user_id)
+    for term in terms:
+        query = query.filter(Note.title.contains(term) | Note.content.contains(term))
+    notes = query.order_by(Note.updated_at.desc()).limit(limit).all()
+    return [{
+        'id': note.id,
+        'title': note.title,
+        'snippet': _like_snippet(note.content, terms),
+        'rank': None,
+        'created_at': note.created_at,
+        'updated_at': note.updated_at,
+    } for note in notes]
+
+
+def search_notes(query, user_id, limit=DEFAULT_LIMIT):
+    """Return ranked notes of `user_id` matching every term of `query` as a word prefix.
+
+    Each result carries a highlighted `snippet` instead of the full content.
+    Uses the Postgres tsvector/GIN index or the SQLite FTS5 table when present
+    and falls back to a LIKE scan on databases that have neither. On Postgres
+    the GIN index leads with user_id; FTS5 cannot be partitioned that way, so
+    on SQLite matches of other users are filtered out after the lookup.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    limit = min(max(int(limit), 1), MAX_LIMIT)
+
+    engine = db.engine
+    if not _has_fts(engine):
+        return _search_like(terms, limit, user_id)
+
+    if engine.dialect.name == 'postgresql':
+        statement = _POSTGRES_SEARCH
+        fts_query = ' & '.join(f'{t}:*' for t in terms)
+    else:
+        statement = _SQLITE_SEARCH
+        fts_query = ' '.join(f'"{t}"*' for t in terms)
+
+    rows = db.session.execute(statement, {'query': fts_query, 'user_id': user_id, 'limit': limit}).mappings()
+    return [dict(row) for row in rows]
@@ -0,0 +1,175 @@
+"""JSON encoding and compression of API responses.
+
+`json_response` replaces flask.jsonify for the note and user blueprints:
+bodies are encoded by the configured backend (orjson when installed, the
+standard library otherwise) and datetimes are written as ISO 8601 by the
+encoder itself, so models can hand over raw column values. Long lists can
+be sent with `stream_json_array` / `iter_ndjson` without building the whole
+body in memory, and `compress_response`, registered as an after_request
+hook, gzip or brotli encodes bodies for clients that accept it.
+"""
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+
+from flask import Response, request, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+JSON_BACKEND = os.getenv('JSON_BACKEND') or ('orjson' if orjson else 'json')
+# Smaller bodies are sent as they are: compressing them saves next to nothing
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson'}
+# Items encoded per chunk of a streamed array / NDJSON body
+STREAM_BATCH_SIZE = 500
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _dumps_json(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _dumps_orjson(obj):
+    # orjson writes naive datetimes exactly like datetime.isoformat()
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+BACKENDS = {'json': _dumps_json}
+if orjson is not None:
+    BACKENDS['orjson'] = _dumps_orjson
+
+
+def register_backend(name, dumps_fn):
+    """Make `dumps_fn(obj) -> bytes` selectable through JSON_BACKEND=name."""
+    BACKENDS[name] = dumps_fn
+
+
+def dumps(obj):
+    """Encode `obj` as compact UTF-8 JSON bytes with the configured backend."""
+    return BACKENDS.get(JSON_BACKEND, _dumps_json)(obj)
+
+
+def json_response(payload):
+    """Drop-in replacement for flask.jsonify taking a single payload."""
+    return Response(dumps(payload), mimetype='application/json')
+
+
+def sse_event(data, event=None):
+    """One Server-Sent Event carrying `data` as JSON, optionally named `event`."""
+    payload = f"data: {dumps(data).decode('utf-8')}\n\n"
+    return f'event: {event}\n{payload}' if event else payload
+
+
+def iter_json_array(items, batch_size=STREAM_BATCH_SIZE):
+    """Encode an iterable as one JSON array, yielding a chunk per `batch_size` items."""
+    opening = b'['
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield opening + dumps(batch)[1:-1]
+            opening = b','
+            batch = []
+    if batch:
+        yield opening + dumps(batch)[1:-1]
+        opening = b','
+    yield b'[]' if opening == b'[' else b']'
+
+
+def iter_ndjson(items, batch_size=STREAM_BATCH_SIZE):
+    """Encode an iterable as NDJSON, yielding a chunk per `batch_size` lines."""
+    lines = []
+    for item in items:
+        lines.append(dumps(item))
+        if len(lines) >= batch_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def stream_json_array(items):
+    """Response streaming `items` as a JSON array (see iter_json_array)."""
+    return Response(stream_with_context(iter_json_array(items)), mimetype='application/json')
+
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress_stream(chunks, encoding):
+    """Compress a streamed body, flushing after every chunk so streams stay incremental."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """after_request hook: compress JSON/NDJSON bodies the client accepts encoded.
+
+    Buffered bodies are compressed when at least COMPRESS_MIN_SIZE bytes;
+    streamed bodies are always compressed, chunk by chunk. A strong ETag
+    becomes weak, since the encoded bytes differ from the identity ones.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code < 200 or response.status_code in (204, 304) or response.direct_passthrough:
+        return response
+    if not response.is_streamed and response.calculate_content_length() < COMPRESS_MIN_SIZE:
+        return response
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    elif encoding == 'br':
+        response.set_data(brotli.compress(response.get_data(), quality=BROTLI_QUALITY))
+    else:
+        response.set_data(gzip.compress(response.get_data(), GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = encoding
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,40 @@
+"""Cold-start timing.
+
+Entry points wrap their import and initialisation steps in `phase(name)`
+and call `finish()` once the app is ready; with STARTUP_PROFILE=true the
+phase timings are printed to stderr. `python -m src.manage profile-startup`
+runs an entry point with this enabled and adds a per-module import
+breakdown. Only the standard library is imported here, so the entry points
+can load this module first.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENABLED = os.getenv('STARTUP_PROFILE', 'false').lower() == 'true'
+
+_started = time.perf_counter()
+_phases = []
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as one startup step."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def report():
+    """Startup steps and their durations, one per line."""
+    lines = [f'  {name:<32} {seconds * 1000:8.1f} ms' for name, seconds in _phases]
+    lines.append(f'  {"total":<32} {(time.perf_counter() - _started) * 1000:8.1f} ms')
+    return 'Startup profile:\n' + '\n'.join(lines)
+
+
+def finish():
+    if ENABLED:
+        print(report(), file=sys.stderr)
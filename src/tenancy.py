@@ -0,0 +1,91 @@
+"""Who the current request acts for.
+
+Every note belongs to a user (note.user_id) and every note query is scoped
+to `current_user_id()`, resolved once per request:
+
+- the X-User-Id header, set by an authenticating proxy in front of the app
+  (the app itself does not authenticate). It is only believed from the
+  proxy: the request must also carry X-Proxy-Secret equal to
+  NOTES_PROXY_SECRET, otherwise it gets 401. Without NOTES_PROXY_SECRET the
+  header is never accepted;
+- otherwise the default user created by migration 0009, which owns the
+  notes that existed before ownership was introduced. With
+  NOTES_REQUIRE_USER=true requests without the header get 401 instead.
+
+The proxy must drop X-User-Id and X-Proxy-Secret sent by clients.
+
+Ids from the header are checked against the user table and remembered for
+a few minutes, so cached reads stay free of database round trips.
+"""
+import hmac
+import os
+
+from flask import abort, g, request
+
+from src import cache
+from src.models.user import User, db
+from src.serialization import json_response
+
+USER_HEADER = 'X-User-Id'
+PROXY_SECRET_HEADER = 'X-Proxy-Secret'
+PROXY_SECRET = os.getenv('NOTES_PROXY_SECRET')
+DEFAULT_USERNAME = 'default'
+REQUIRE_USER = os.getenv('NOTES_REQUIRE_USER', 'false').lower() == 'true'
+
+_known_users = cache.TTLCache(maxsize=4096, ttl=300)
+_default_user_ids = {}
+
+
+def _reject(status, message):
+    response = json_response({'error': message})
+    response.status_code = status
+    abort(response)
+
+
+def _default_user_id():
+    key = str(db.engine.url)
+    if key not in _default_user_ids:
+        user_id = db.session.query(User.id).filter_by(username=DEFAULT_USERNAME).scalar()
+        if user_id is None:
+            _reject(401, f'no {USER_HEADER} header and no default user; run `python -m src.manage migrate`')
+        _default_user_ids[key] = user_id
+    return _default_user_ids[key]
+
+
+def _from_proxy():
+    secret = request.headers.get(PROXY_SECRET_HEADER)
+    return bool(PROXY_SECRET) and secret is not None and hmac.compare_digest(
+        secret.encode('utf-8'), PROXY_SECRET.encode('utf-8')
+    )
+
+
+def _resolve():
+    raw = request.headers.get(USER_HEADER)
+    if raw is None:
+        if REQUIRE_USER:
+            _reject(401, f'{USER_HEADER} header required')
+        return _default_user_id()
+    # Anyone can send the header; only the proxy can vouch for it
+    if not _from_proxy():
+        _reject(401, f'{USER_HEADER} is only accepted from the trusted proxy ({PROXY_SECRET_HEADER})')
+    try:
+        user_id = int(raw)
+    except ValueError:
+        _reject(400, f'{USER_HEADER} must be an integer')
+    if _known_users.get(user_id) is None:
+        if db.session.get(User, user_id) is None:
+            _reject(401, 'unknown user')
+        _known_users.set(user_id, True)
+    return user_id
+
+
+def current_user_id():
+    """Id of the user the current request acts for; aborts with 400/401 if there is none."""
+    if 'user_id' not in g:
+        g.user_id = _resolve()
+    return g.user_id
+
+
+def forget_user(user_id):
+    """Drop a deleted user from the memo of known ids."""
+    _known_users.delete(user_id)
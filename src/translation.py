@@ -0,0 +1,378 @@
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src import llm
+from src.cache import TTLCache
+from src.models.translation import TranslationCacheEntry, db
+
+CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', '1024'))
+CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', str(7 * 24 * 3600)))
+PERSIST = os.getenv('TRANSLATION_CACHE_PERSIST', 'true').lower() == 'true'
+DB_MAX_ROWS = int(os.getenv('TRANSLATION_CACHE_DB_MAX_ROWS', '100000'))
+# Row-count checks for the persistent tier run once per this many writes
+DB_PRUNE_EVERY = 100
+
+_memory = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_counters = {'db_hits': 0, 'db_misses': 0, 'db_writes': 0, 'db_evictions': 0}
+
+
+def cache_key(content, source_lang, target_lang, model=None):
+    """Content address of a translation: identical inputs share one entry."""
+    payload = json.dumps(
+        [llm.TRANSLATE_PROMPT_VERSION, model or llm.TRANSLATE_MODEL, source_lang, target_lang, content],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _db_get_many(keys):
+    rows = db.session.query(
+        TranslationCacheEntry.key, TranslationCacheEntry.translation, TranslationCacheEntry.expires_at
+    ).filter(TranslationCacheEntry.key.in_(keys)).all()
+    now = datetime.utcnow()
+    found = {row.key: row.translation for row in rows if not row.expires_at or row.expires_at > now}
+    _counters['db_hits'] += len(found)
+    _counters['db_misses'] += len(keys) - len(found)
+    return found
+
+
+def _db_put_many(entries):
+    expires_at = datetime.utcnow() + timedelta(seconds=CACHE_TTL) if CACHE_TTL else None
+    rows = {
+        key: TranslationCacheEntry(
+            key=key,
+            note_id=note_id,
+            model=llm.TRANSLATE_MODEL,
+            translation=translation,
+            expires_at=expires_at,
+        )
+        for key, translation, note_id in entries
+    }
+    try:
+        # Replaces expired rows for the same keys in the same transaction
+        TranslationCacheEntry.query.filter(
+            TranslationCacheEntry.key.in_(list(rows))
+        ).delete(synchronize_session=False)
+        db.session.add_all(rows.values())
+        db.session.commit()
+    except SQLAlchemyError:
+        # A concurrent writer stored the same key; the cache is best effort
+        db.session.rollback()
+        return
+    before = _counters['db_writes']
+    _counters['db_writes'] += len(rows)
+    if before // DB_PRUNE_EVERY != _counters['db_writes'] // DB_PRUNE_EVERY:
+        prune()
+
+
+def prune():
+    """Drop expired rows, then the oldest rows beyond DB_MAX_ROWS."""
+    now = datetime.utcnow()
+    removed = TranslationCacheEntry.query.filter(
+        TranslationCacheEntry.expires_at <= now
+    ).delete(synchronize_session=False)
+
+    excess = TranslationCacheEntry.query.count() - DB_MAX_ROWS
+    if excess > 0:
+        oldest = db.session.query(TranslationCacheEntry.key).order_by(
+            TranslationCacheEntry.created_at
+        ).limit(excess)
+        removed += TranslationCacheEntry.query.filter(
+            TranslationCacheEntry.key.in_(oldest.scalar_subquery())
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    _counters['db_evictions'] += removed
+    return removed
+
+
+def lookup_many(keys):
+    """Return {key: translation} for every key found in either tier."""
+    found = {}
+    missing = []
+    for key in keys:
+        translation = _memory.get(key)
+        if translation is None:
+            missing.append(key)
+        else:
+            found[key] = translation
+    if missing and PERSIST:
+        from_db = _db_get_many(missing)
+        for key, translation in from_db.items():
+            _memory.set(key, translation)
+        found.update(from_db)
+    return found
+
+
+def lookup(key):
+    """Return the cached translation for `key` from either tier, or None."""
+    return lookup_many([key]).get(key)
+
+
+def store_many(entries):
+    """Cache (key, translation, note_id) triples in both tiers with one commit."""
+    if not entries:
+        return
+    for key, translation, _ in entries:
+        _memory.set(key, translation)
+    if PERSIST:
+        _db_put_many(entries)
+
+
+def store(key, translation, note_id=None):
+    store_many([(key, translation, note_id)])
+
+
+def _schedule_chunks(chunk_lists, source_lang, target_lang, skip_lookup=()):
+    """Resolve chunks against the cache and submit the misses to the llm pool.
+
+    Chunks are content addressed on their own, so after an edit only the
+    chunks that changed miss the cache, and identical chunks across
+    documents are translated once. Returns (keys per list, cached, futures).
+    """
+    keys_per_list = [
+        [cache_key(chunk, source_lang, target_lang) if chunk.strip() else None for chunk, _ in chunks]
+        for chunks in chunk_lists
+    ]
+    wanted = {key for keys in keys_per_list for key in keys if key and key not in skip_lookup}
+    cached = lookup_many(list(wanted))
+
+    futures = {}
+    for chunks, keys in zip(chunk_lists, keys_per_list):
+        for (chunk, _), key in zip(chunks, keys):
+            if key and key not in cached and key not in futures:
+                futures[key] = llm.submit_translation(chunk, source_lang, target_lang)
+    return keys_per_list, cached, futures
+
+
+def _assemble(chunks, keys, cached, futures):
+    """Yield the translated pieces of one document in order, waiting on its futures."""
+    for (chunk, sep), key in zip(chunks, keys):
+        if key is None:
+            yield chunk + sep
+        elif key in cached:
+            yield cached[key] + sep
+        else:
+            yield futures[key].result() + sep
+
+
+def _chunk_entries(futures):
+    """Cache entries for finished chunk translations. Chunk entries carry no
+    note_id so they survive the invalidation of the whole-document entry."""
+    return [
+        (key, future.result(), None)
+        for key, future in futures.items()
+        if future.done() and not future.cancelled() and future.exception() is None
+    ]
+
+
+def _translate_chunks(chunks, source_lang, target_lang, skip_lookup=()):
+    """Yield the translation of (chunk, separator) pairs piece by piece, in order.
+
+    New chunk translations are cached once all pieces have been produced.
+    """
+    (keys,), cached, futures = _schedule_chunks([chunks], source_lang, target_lang, skip_lookup)
+    try:
+        yield from _assemble(chunks, keys, cached, futures)
+    finally:
+        # Stop queued work if the consumer went away early
+        for future in futures.values():
+            future.cancel()
+    store_many(_chunk_entries(futures))
+
+
+def translate(content, source_lang='English', target_lang='Chinese', note_id=None):
+    """Translate through the cache. Returns (translation, cached).
+
+    Long content is split into chunks that are translated in parallel and
+    cached individually (see _translate_chunks).
+    """
+    key = cache_key(content, source_lang, target_lang)
+
+    translation = lookup(key)
+    if translation is not None:
+        return translation, True
+
+    chunks = llm.split_into_chunks(content)
+    translation = ''.join(_translate_chunks(chunks, source_lang, target_lang, skip_lookup={key})).strip()
+    store(key, translation, note_id)
+    return translation, False
+
+
+def translate_stream(content, source_lang='English', target_lang='Chinese', note_id=None):
+    """Streaming translate through the cache.
+
+    Yields (delta, cached) pairs; a cache hit is yielded as a single delta.
+    Short content streams token by token, long content chunk by chunk in
+    document order. The full translation is cached only if the stream runs
+    to completion.
+    """
+    key = cache_key(content, source_lang, target_lang)
+
+    translation = lookup(key)
+    if translation is not None:
+        yield translation, True
+        return
+
+    chunks = llm.split_into_chunks(content)
+    if len(chunks) > 1:
+        deltas = _translate_chunks(chunks, source_lang, target_lang, skip_lookup={key})
+    else:
+        deltas = llm.translate_text_stream(content, source_lang=source_lang, target_lang=target_lang)
+
+    parts = []
+    for delta in deltas:
+        parts.append(delta)
+        yield delta, False
+    store(key, ''.join(parts).strip(), note_id)
+
+
+async def _translate_chunks_async(chunks, source_lang, target_lang, skip_lookup=()):
+    """Async _translate_chunks: missing chunks are translated concurrently on
+    the event loop, pieces are yielded in document order."""
+    keys = [cache_key(chunk, source_lang, target_lang) if chunk.strip() else None for chunk, _ in chunks]
+    wanted = list({key for key in keys if key and key not in skip_lookup})
+    cached = await asyncio.to_thread(lookup_many, wanted)
+
+    tasks = {}
+    for (chunk, _), key in zip(chunks, keys):
+        if key and key not in cached and key not in tasks:
+            tasks[key] = asyncio.ensure_future(llm.translate_text_async(chunk, source_lang, target_lang))
+    try:
+        for (chunk, sep), key in zip(chunks, keys):
+            if key is None:
+                yield chunk + sep
+            elif key in cached:
+                yield cached[key] + sep
+            else:
+                yield await tasks[key] + sep
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    await asyncio.to_thread(store_many, [(key, task.result(), None) for key, task in tasks.items()])
+
+
+async def translate_async(content, source_lang='English', target_lang='Chinese', note_id=None):
+    """Async translate, for the ASGI app. Returns (translation, cached).
+
+    The cache tiers are read and written on worker threads (they may query
+    the database); upstream calls run on the event loop.
+    """
+    key = cache_key(content, source_lang, target_lang)
+
+    translation = await asyncio.to_thread(lookup, key)
+    if translation is not None:
+        return translation, True
+
+    chunks = llm.split_into_chunks(content)
+    pieces = _translate_chunks_async(chunks, source_lang, target_lang, skip_lookup={key})
+    translation = ''.join([piece async for piece in pieces]).strip()
+    await asyncio.to_thread(store, key, translation, note_id)
+    return translation, False
+
+
+async def translate_stream_async(content, source_lang='English', target_lang='Chinese', note_id=None):
+    """Async translate_stream: yields (delta, cached) pairs."""
+    key = cache_key(content, source_lang, target_lang)
+
+    translation = await asyncio.to_thread(lookup, key)
+    if translation is not None:
+        yield translation, True
+        return
+
+    chunks = llm.split_into_chunks(content)
+    if len(chunks) > 1:
+        deltas = _translate_chunks_async(chunks, source_lang, target_lang, skip_lookup={key})
+    else:
+        deltas = llm.translate_text_stream_async(content, source_lang=source_lang, target_lang=target_lang)
+
+    parts = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield delta, False
+    finally:
+        await deltas.aclose()
+    await asyncio.to_thread(store, key, ''.join(parts).strip(), note_id)
+
+
+def translate_many(items, source_lang='English', target_lang='Chinese'):
+    """Translate many documents at once, yielding (index, result) as each finishes.
+
+    `items` is a list of (content, note_id) pairs. Whole-document and chunk
+    cache lookups are each a single query, identical bodies are translated
+    once, and all missing chunks share the llm worker pool (and its rate
+    limiter). A result is {'translation': ..., 'cached': bool} or
+    {'error': ...}; new translations are cached when the iteration ends.
+    """
+    doc_keys = [cache_key(content, source_lang, target_lang) for content, _ in items]
+    hits = lookup_many(list(set(doc_keys)))
+
+    pending = {}  # doc key -> indexes of items with that body
+    for index, key in enumerate(doc_keys):
+        if key in hits:
+            yield index, {'translation': hits[key], 'cached': True}
+        else:
+            pending.setdefault(key, []).append(index)
+
+    plans = {key: llm.split_into_chunks(items[indexes[0]][0]) for key, indexes in pending.items()}
+    keys_per_list, cached, futures = _schedule_chunks(
+        list(plans.values()), source_lang, target_lang, skip_lookup=set(plans)
+    )
+    chunk_keys = dict(zip(plans, keys_per_list))
+    waiting = {
+        doc_key: {futures[k] for k in keys if k in futures}
+        for doc_key, keys in chunk_keys.items()
+    }
+
+    doc_entries = []
+    try:
+        while waiting:
+            ready = [doc_key for doc_key, deps in waiting.items() if all(f.done() for f in deps)]
+            if not ready:
+                outstanding = set().union(*waiting.values())
+                wait(outstanding, return_when=FIRST_COMPLETED)
+                continue
+            for doc_key in ready:
+                del waiting[doc_key]
+                try:
+                    translation = ''.join(
+                        _assemble(plans[doc_key], chunk_keys[doc_key], cached, futures)
+                    ).strip()
+                    result = {'translation': translation, 'cached': False}
+                    note_id = next((items[i][1] for i in pending[doc_key] if items[i][1]), None)
+                    doc_entries.append((doc_key, translation, note_id))
+                except Exception as e:
+                    result = {'error': 'translation failed', 'detail': str(e)}
+                for index in pending[doc_key]:
+                    yield index, result
+    finally:
+        for future in futures.values():
+            future.cancel()
+        store_many(_chunk_entries(futures) + doc_entries)
+
+
+def invalidate_note(note_id):
+    """Forget persisted translations of a note whose content changed.
+
+    Runs inside the caller's transaction. In-memory entries need no purge:
+    they are addressed by content, so the edited note can no longer hit them.
+    """
+    invalidate_notes([note_id])
+
+
+def invalidate_notes(note_ids):
+    """invalidate_note for many notes with a single statement."""
+    if PERSIST and note_ids:
+        TranslationCacheEntry.query.filter(
+            TranslationCacheEntry.note_id.in_(list(note_ids))
+        ).delete(synchronize_session=False)
+
+
+def stats():
+    return {'memory': _memory.stats(), 'database': dict(_counters, enabled=PERSIST)}
@@ -0,0 +1,249 @@
+"""In-memory top-k similarity search over unit-length float32 vectors.
+
+Small indexes are searched exactly: one matrix-vector product and an
+argpartition. From IVF_MIN_VECTORS vectors on, an inverted-file (IVF)
+index is built as well: vectors are grouped around k-means centroids and a
+query only scans the IVF_NPROBE groups whose centroids are closest to it,
+which keeps searches in the low milliseconds at millions of vectors for a
+small loss of recall.
+"""
+import copy
+import os
+import threading
+
+import numpy as np
+
+IVF_MIN_VECTORS = int(os.getenv('EMBEDDING_IVF_MIN_VECTORS', '50000'))
+IVF_NPROBE = int(os.getenv('EMBEDDING_IVF_NPROBE', '16'))
+IVF_TRAIN_ITERATIONS = 10
+# Centroids are trained on at most this many vectors per list
+IVF_TRAIN_PER_LIST = 64
+# Vectors scored per matrix product while assigning vectors to lists
+ASSIGN_BLOCK = 65536
+# Removed slots are compacted away once there are this many, and a quarter of the index
+COMPACT_MIN_REMOVED = 1024
+
+
+def normalize(vectors):
+    """Scale rows to unit length (zero rows stay zero) as contiguous float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.maximum(norms, 1e-12), dtype=np.float32)
+
+
+def _top_k(scores, k):
+    """Positions of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class VectorIndex:
+    """Inner-product (cosine, for unit vectors) search keyed by integer ids.
+
+    upsert() adds or replaces vectors in place; the arrays grow by half
+    their capacity at a time, so keeping an index current is cheap per
+    vector. The IVF lists are built on a background thread (searches are
+    exact until they are ready) and kept current by later upserts. Slots of
+    removed vectors are compacted away once they make up a quarter of the
+    index. Writes are serialised by a lock; searches take none and work on
+    the arrays last published by a write.
+    """
+
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._positions = {}
+        self._size = 0
+        # Removed vectors leave a zeroed slot with id -1 behind
+        self._removed = 0
+        self._ivf = None
+        # Positions written while the IVF is being built, or None when no build runs
+        self._changed_during_build = None
+        self._lock = threading.Lock()
+        self._publish()
+
+    def __len__(self):
+        return self._size
+
+    def _publish(self):
+        # One attribute, so a search never mixes arrays from before and after a compaction
+        self._view = (self._ids, self._vectors, self._size, self._removed, self._ivf)
+
+    def _reserve(self, size):
+        if size <= len(self._ids):
+            return
+        capacity = max(size, len(self._ids) * 3 // 2, 1024)
+        ids = np.empty(capacity, dtype=np.int64)
+        vectors = np.empty((capacity, self.dimensions), dtype=np.float32)
+        ids[:self._size] = self._ids[:self._size]
+        vectors[:self._size] = self._vectors[:self._size]
+        self._ids, self._vectors = ids, vectors
+
+    def upsert(self, ids, vectors):
+        """Add or replace the vectors of `ids` (vectors must be unit length)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        if not len(ids):
+            return
+        # The last vector given for an id wins
+        ids, last = np.unique(ids[::-1], return_index=True)
+        vectors = vectors[::-1][last]
+
+        with self._lock:
+            positions = np.fromiter((self._positions.get(i, -1) for i in ids.tolist()), dtype=np.int64, count=len(ids))
+            new = positions < 0
+            added = int(new.sum())
+            self._reserve(self._size + added)
+            positions[new] = np.arange(self._size, self._size + added)
+            self._ids[positions[new]] = ids[new]
+            self._positions.update(zip(ids[new].tolist(), positions[new].tolist()))
+            self._vectors[positions] = vectors
+            self._size += added
+
+            if self._ivf is not None and self._size > 2 * self._ivf.trained_size:
+                # The centroids describe a fraction of the data by now
+                self._ivf = None
+            if self._ivf is not None:
+                self._ivf.reassign(self._vectors, positions)
+            elif self._changed_during_build is not None:
+                self._changed_during_build.append(positions)
+            elif self._size >= IVF_MIN_VECTORS:
+                self._changed_during_build = []
+                threading.Thread(target=self._build_ivf, args=(self._size,), name='ivf-build', daemon=True).start()
+            self._publish()
+
+    def remove(self, ids):
+        """Drop the vectors of `ids` (unknown ids are ignored)."""
+        with self._lock:
+            positions = [self._positions.pop(i) for i in ids if i in self._positions]
+            if positions:
+                self._ids[positions] = -1
+                self._vectors[positions] = 0
+                self._removed += len(positions)
+                # Not while an IVF build reads the arrays by position
+                if self._removed >= max(COMPACT_MIN_REMOVED, self._size // 4) and self._changed_during_build is None:
+                    self._compact()
+                self._publish()
+
+    def _compact(self):
+        """Move the live vectors into new arrays without the removed slots."""
+        keep = np.flatnonzero(self._ids[:self._size] >= 0)
+        size = len(keep)
+        ids = np.empty(max(size * 3 // 2, 1024), dtype=np.int64)
+        vectors = np.empty((len(ids), self.dimensions), dtype=np.float32)
+        ids[:size] = self._ids[keep]
+        vectors[:size] = self._vectors[keep]
+        if self._ivf is not None:
+            self._ivf = self._ivf.compacted(keep, self._size)
+        # New arrays rather than moving rows in place: searches may still read the old ones
+        self._ids, self._vectors, self._size, self._removed = ids, vectors, size, 0
+        self._positions = dict(zip(ids[:size].tolist(), range(size)))
+
+    def _build_ivf(self, size):
+        ivf = None
+        try:
+            ivf = _IVF(self._vectors[:size])
+        finally:
+            with self._lock:
+                changed = self._changed_during_build
+                self._changed_during_build = None
+                if ivf is not None:
+                    if changed:
+                        ivf.reassign(self._vectors, np.concatenate(changed))
+                    self._ivf = ivf
+                    self._publish()
+
+    def search(self, query, k):
+        """Return (ids, scores) of the k vectors most similar to `query`, best first."""
+        all_ids, all_vectors, size, removed, ivf = self._view
+        if not size or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize(query).reshape(self.dimensions)
+        candidates = ivf.candidates(query, min(IVF_NPROBE, ivf.lists)) if ivf is not None else None
+        vectors = all_vectors[:size] if candidates is None else all_vectors[candidates]
+        scores = vectors @ query
+        # Removed slots score 0 and may rank; ask for enough to drop them
+        top = _top_k(scores, k + removed)
+        ids = all_ids[top] if candidates is None else all_ids[candidates[top]]
+        kept = ids >= 0
+        return ids[kept][:k], scores[top][kept][:k]
+
+
+class _IVF:
+    """Inverted lists of vector positions around spherical k-means centroids."""
+
+    def __init__(self, vectors):
+        self.trained_size = len(vectors)
+        self.lists = max(int(np.sqrt(len(vectors))), 1)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), self.lists * IVF_TRAIN_PER_LIST), replace=False)]
+        self.centroids = sample[rng.choice(len(sample), self.lists, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ self.centroids.T, axis=1)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            # Lists that lost every vector restart from a random sample
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            self.centroids = normalize(sums)
+
+        self.assignment = self._assign(vectors)
+        order = np.argsort(self.assignment, kind='stable')
+        bounds = np.searchsorted(self.assignment[order], np.arange(self.lists + 1))
+        self._members = [order[bounds[i]:bounds[i + 1]] for i in range(self.lists)]
+
+    def _assign(self, vectors):
+        return np.concatenate([
+            np.argmax(vectors[start:start + ASSIGN_BLOCK] @ self.centroids.T, axis=1)
+            for start in range(0, len(vectors), ASSIGN_BLOCK)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def reassign(self, vectors, positions):
+        """Move changed or new positions to the lists of their (new) nearest centroid.
+
+        Touched lists are replaced by new arrays rather than modified, so
+        concurrent searches see either the old or the new list.
+        """
+        targets = self._assign(vectors[positions])
+        if positions.max() >= len(self.assignment):
+            grown = np.full(positions.max() + 1, -1, dtype=np.int64)
+            grown[:len(self.assignment)] = self.assignment
+            self.assignment = grown
+        added, removed = {}, {}
+        for position, target in zip(positions.tolist(), targets.tolist()):
+            current = self.assignment[position]
+            if current == target:
+                continue
+            if current >= 0:
+                removed.setdefault(current, []).append(position)
+            added.setdefault(target, []).append(position)
+            self.assignment[position] = target
+        for index in set(added) | set(removed):
+            members = self._members[index]
+            if index in removed:
+                members = members[~np.isin(members, removed[index])]
+            if index in added:
+                members = np.concatenate([members, np.asarray(added[index], dtype=np.int64)])
+            self._members[index] = members
+
+    def compacted(self, keep, size):
+        """A copy (same centroids) for the arrays holding only positions `keep` of the first `size`."""
+        moved = np.full(max(size, len(self.assignment)), -1, dtype=np.int64)
+        moved[keep] = np.arange(len(keep))
+        ivf = copy.copy(self)
+        ivf.assignment = np.full(len(keep), -1, dtype=np.int64)
+        known = keep[keep < len(self.assignment)]
+        ivf.assignment[moved[known]] = self.assignment[known]
+        ivf._members = []
+        for members in self._members:
+            members = moved[members]
+            ivf._members.append(members[members >= 0])
+        return ivf
+
+    def candidates(self, query, nprobe):
+        """Positions in the `nprobe` lists closest to `query`."""
+        nearest = _top_k(self.centroids @ query, nprobe)
+        return np.concatenate([self._members[i] for i in nearest.tolist()])
@@ -0,0 +1,43 @@
+"""Standalone job worker: python -m src.worker [--threads N]
+
+Processes the queue in src/jobs.py and the note change outbox
+(src/changes.py) outside the web process, for deployments that set
+JOB_WORKER_MODE=external (e.g. serverless web workers).
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+os.environ.setdefault('JOB_WORKER_MODE', 'external')
+
+from src.main import app
+from src import changes, jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background job workers.')
+    parser.add_argument('--threads', type=int, default=jobs.WORKER_THREADS)
+    parser.add_argument('--once', action='store_true', help='drain the queue once and exit')
+    args = parser.parse_args()
+
+    if args.once:
+        with app.app_context():
+            print(f'Processed {jobs.run_pending()} jobs and {changes.process_pending()} note changes')
+        return
+
+    stop = threading.Event()
+    threads = jobs.start_workers(app, threads=args.threads, stop=stop)
+    print(f'Job worker running with {len(threads)} threads')
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == '__main__':
+    main()